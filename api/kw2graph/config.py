@@ -9,6 +9,10 @@ class Settings(BaseSettings):
     # The default value is set for the development environment.
     # Overridden by environment variables.
     env: str = 'local'
+    # asyncio.to_thread が使う既定 Executor のワーカースレッド数 (同期 SDK 呼び出しの並行数の上限)
+    default_executor_max_workers: int = 32
+    # structlog のログレベル (これ未満のログはメッセージ組み立て前に破棄される)
+    log_level: str = 'INFO'
     aws_access_key_id: str = 'localstack'
     aws_secret_access_key: str = 'localstack'
     aws_region_name: str = 'ap-northeast-1'
@@ -19,14 +23,45 @@ class Settings(BaseSettings):
     openai_api_key: str = ''
     openai_org_id: str = ''
     openai_project_id: str = ''
+    # OpenAI API の同時リクエスト数と、1 分あたりのリクエスト数の上限 (アカウントのレート制限に合わせる)
+    openai_max_concurrency: int = 16
+    openai_requests_per_minute: int = 500
+    # 429 / 5xx / 接続エラー時の SDK 内での再試行回数と、1 リクエストあたりのタイムアウト (秒)
+    # (再試行は Retry-After を尊重したジッター付き指数バックオフで行われる)
+    openai_max_retries: int = 5
+    openai_timeout_seconds: float = 60.0
+    # バックグラウンドタスク (/submit_task) の抽出を Batch API (半額・非リアルタイム) で行うかどうかと、完了確認の間隔 (秒)
+    openai_use_batch_api: bool = False
+    openai_batch_poll_interval_seconds: float = 60.0
+    # Batch の完了を待つ上限 (秒)。超過した Batch は取り消し、結果は空として扱う (completion_window の 24h に合わせる)
+    openai_batch_timeout_seconds: float = 86400.0
     # Graph DB
     graphdb_host: str = 'localhost'
     graphdb_port: int = 8182
+    # Gremlin サーバーの実装 ('tinkerpop' / 'janusgraph' / 'neptune')。プロバイダ固有のクエリヒントの切り替えに使用する
+    graphdb_provider: str = 'tinkerpop'
+    # Gremlin Client のコネクションプール (WebSocket 接続数) とワーカースレッド数
+    # (gremlinpython の既定値は接続 1 本のため、並行クエリ数に合わせて明示的に指定する)
+    gremlin_pool_size: int = 16
+    gremlin_max_workers: int = 16
+    # 関連キーワード登録時の 1 スクリプトあたりのキーワード数と、並行に送信するスクリプト数
+    graphdb_write_batch_size: int = 25
+    graphdb_write_concurrency: int = 4
+    # 再帰探索 (/submit_task) で同時に処理中とするキーワード数の上限
+    max_recursive_concurrency: int = 32
+    # 上記のうち、ES 取得 / GraphDB 登録の各段を同時に実行するキーワード数の上限 (各コネクションプールの枯渇を防ぐ)
+    # (OpenAI 解析の段は openai_max_concurrency / openai_requests_per_minute で制限される)
+    recursive_fetch_concurrency: int = 8
+    recursive_register_concurrency: int = 4
+    # /show_graph でグラフ DB の結果 (リポジトリで型を整形済み) を検証せずに出力モデルへ詰め替えるかどうか
+    trust_graphdb_payload: bool = True
 
     class Config:
         # https://pydantic-docs.helpmanual.io/usage/settings/#dotenv-env-support
         env_file = '.env'
         env_file_encoding = 'utf-8'
+        # 起動時に一度だけ読み込んだ値をプロセス全体で共有するため、不変 (かつハッシュ可能) にする
+        frozen = True
 
 
 @lru_cache
@@ -1,3 +1,6 @@
+from itertools import zip_longest
+from typing import List, Dict, Any, Iterator
+
 import structlog
 from elastic_transport import ObjectApiResponse
 
@@ -16,18 +19,69 @@ class ContentsFetcherService(ServiceBase):
         super().__init__(settings)
         self.es_repo = ElasticsearchRepository(settings)
 
-    async def fetch(self, in_data: GetCandidateInput) -> GetCandidateOutput:
-        response = await self.es_repo.search(in_data.index, in_data.field, in_data.keyword)
-        logger.info(f"Found {len(response['hits'])} candidates")
+    async def fetch(self, in_data: GetCandidateInput, source_fields: List[str] | None = None) -> GetCandidateOutput:
+        response = await self.es_repo.search(in_data.index, in_data.field, in_data.keyword,
+                                             source_fields=source_fields)
+        logger.info("Found candidates.", keyword=in_data.keyword, count=len(self._hits(response)))
 
         return self.parse_response(seed_keyword=in_data.keyword, response=response)
 
+    async def fetch_iter(self, in_data: GetCandidateInput,
+                         source_fields: List[str] | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        fetch と同じ検索を行い、GetCandidateOutput を組み立てずにヒットの _source を順に返すイテレータを返す。
+        タイトル正規化などの後段処理へ、中間リストを作らずに流し込むために使用する。
+        """
+        response = await self.es_repo.search(in_data.index, in_data.field, in_data.keyword,
+                                             source_fields=source_fields)
+        logger.info("Found candidates.", keyword=in_data.keyword, count=len(self._hits(response)))
+
+        return self.parse_response_iter(response)
+
+    async def fetch_many(self, index: str, field: str, keywords: List[str],
+                         source_fields: List[str] | None = None) -> List[GetCandidateOutput]:
+        """
+        複数キーワードの候補を msearch でまとめて取得する。
+        戻り値は keywords と同じ順序の GetCandidateOutput のリスト。
+        """
+        if not keywords:
+            return []
+
+        response = await self.es_repo.msearch(index, field, keywords, source_fields=source_fields)
+        # filter_path により全件ヒットなしの場合は空の要素となるため、keywords の長さに揃えて扱う
+        responses = response['responses'] if 'responses' in response else []
+
+        outputs: List[GetCandidateOutput] = []
+        for keyword, item in zip_longest(keywords, responses[:len(keywords)], fillvalue={}):
+            if 'error' in item:
+                # 1件の失敗で全体を失敗させず、そのキーワードのみ空の結果とする
+                logger.error("msearch item failed.", keyword=keyword, error=item['error'])
+                outputs.append(GetCandidateOutput(seed_keyword=keyword, candidates=[]))
+                continue
+            outputs.append(self.parse_response(seed_keyword=keyword, response=item))
+
+        return outputs
+
+    @staticmethod
+    def parse_response(seed_keyword: str, response: ObjectApiResponse | Dict[str, Any]) -> GetCandidateOutput:
+        hits = ContentsFetcherService._hits(response)
+        if not hits:
+            # ヒットなしの場合はログ出力・リスト構築を省略して即座に返す
+            return GetCandidateOutput.model_construct(seed_keyword=seed_keyword, candidates=[])
+
+        candidates = [hit['_source'] for hit in hits]
+
+        logger.debug("candidates", seed_keyword=seed_keyword, candidates=candidates)
+        # ES のドキュメントは信頼できるデータのため、要素毎のバリデーションを省略して構築する
+        return GetCandidateOutput.model_construct(seed_keyword=seed_keyword, candidates=candidates)
+
+    @staticmethod
+    def parse_response_iter(response: ObjectApiResponse | Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """検索レスポンスのヒットから _source を順に返すジェネレータ。"""
+        return (hit['_source'] for hit in ContentsFetcherService._hits(response))
+
     @staticmethod
-    def parse_response(seed_keyword: str, response: ObjectApiResponse) -> GetCandidateOutput:
-        candidates = []
-        for hit in response['hits']['hits']:
-            source = hit['_source']
-            candidates.append(source)
-
-        logger.debug(f"candidates: {candidates}")
-        return GetCandidateOutput(seed_keyword=seed_keyword, candidates=candidates)
+    def _hits(response: ObjectApiResponse | Dict[str, Any]) -> List[Dict[str, Any]]:
+        """filter_path 指定時はヒットなしで hits.hits が省略されるため、欠損を空リストとして扱う"""
+        hits = response['hits'] if 'hits' in response else {}
+        return hits.get('hits', [])
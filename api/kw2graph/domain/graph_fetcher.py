@@ -1,3 +1,6 @@
+import asyncio
+from typing import Dict, Any, List, Set
+
 import structlog
 
 from kw2graph.domain.base import ServiceBase
@@ -16,16 +19,89 @@ class GraphFetcherService(ServiceBase):
         """
         グラフリポジトリから関連グラフデータを取得する。
         """
-        # 現在、特別なドメインロジックはないため、リポジトリを直接呼び出す
         if len(in_data.seed_keywords) > 1:
-            response = await self.repo.fetch_common_nodes(in_data.seed_keywords, in_data.min_score,
-                                                          in_data.entity_type, in_data.iab_category)
+            response = await self.fetch_common_nodes(in_data)
 
         else:
             response = await self.repo.fetch_related_graph(in_data.seed_keywords[0], in_data.max_depth,
                                                            in_data.min_score,
                                                            in_data.entity_type, in_data.iab_category)
 
-        logger.info(f"fetch {in_data.seed_keywords} result: {response}")
+        logger.info("Fetched graph data.", seed_keywords=in_data.seed_keywords,
+                    nodes=len(response['nodes']), edges=len(response['edges']))
+        logger.debug("Fetched graph result.", seed_keywords=in_data.seed_keywords, result=response)
 
         return response
+
+    # -----------------------------------------------------------------
+    # 複数キーワード x 共通ノード探索 (AND条件)
+    # -----------------------------------------------------------------
+
+    async def fetch_common_nodes(self, in_data: ShowGraphInput) -> GraphData:
+        """
+        全てのシードキーワードから 1 ホップで到達できる共通ノードと、シードノード群を返す。
+        シード毎の取得は並行に実行し、共通ノードの判定 (積集合) は Python 側で行う。
+        """
+        seed_keywords = in_data.seed_keywords
+        entity_type = in_data.entity_type
+        iab_category = in_data.iab_category
+        logger.info("Fetching graph data (Common Node Search).", seed_keywords=seed_keywords,
+                    min_score=in_data.min_score, entity_type=entity_type, iab_category=iab_category)
+
+        # entity_type / iab_category はトラバーサルに渡さない。
+        # シードノード (BULK_REGISTER_SCRIPT は entity_type を付与しない) まで除外されてしまい、
+        # シードと共通ノードを結ぶエッジが全て落ちるため、フィルタは下の 2. で共通ノードにのみ適用する
+        results: List[GraphData] = await asyncio.gather(*(
+            self.repo.fetch_related_graph(keyword, 1, in_data.min_score)
+            for keyword in seed_keywords
+        ))
+
+        # 1. 各結果に含まれるノードを (初出順に) 集約し、シードノードの ID を特定する
+        # id -> node の dict を経由せず、既出 ID の集合とリストで直接組み立てる
+        seed_names = set(seed_keywords)
+        nodes: List[Dict[str, Any]] = []
+        seen_node_ids: Set[str] = set()
+        seed_node_ids: Set[str] = set()
+        for result in results:
+            for node in result['nodes']:
+                node_id = node['id']
+                if node_id in seen_node_ids:
+                    continue
+                seen_node_ids.add(node_id)
+                nodes.append(node)
+                if node.get('original_name') in seed_names:
+                    seed_node_ids.add(node_id)
+
+        # 2. 全シードの近傍に含まれ、entity_type / iab_category の条件を満たすノード (シード自身は除く) を共通ノードとする
+        common_node_ids: Set[str] = set.intersection(
+            *({node['id'] for node in result['nodes']} for result in results)
+        ) - seed_node_ids
+        if entity_type or iab_category:
+            common_node_ids = {
+                node['id'] for node in nodes
+                if node['id'] in common_node_ids
+                and (not entity_type or node['entity_type'] == entity_type)
+                and (not iab_category or iab_category in node['iab_categories'])
+            }
+        keep_node_ids = common_node_ids | seed_node_ids
+
+        # 3. シードノードと共通ノードの間のエッジのみを重複除去して採用する
+        edges: List[Dict[str, Any]] = []
+        seen_edge_ids: Set[str] = set()
+        connected_node_ids: Set[str] = set()
+        for result in results:
+            for edge in result['edges']:
+                edge_id = edge['id']
+                if edge_id in seen_edge_ids:
+                    continue
+                if edge['from_node'] in keep_node_ids and edge['to_node'] in keep_node_ids:
+                    seen_edge_ids.add(edge_id)
+                    edges.append(edge)
+                    connected_node_ids.add(edge['from_node'])
+                    connected_node_ids.add(edge['to_node'])
+
+        # 4. 孤立ノードの除去 (採用したエッジの端点に含まれるノードのみ残す)
+        final_nodes = [node for node in nodes
+                       if node['id'] in keep_node_ids and node['id'] in connected_node_ids]
+
+        return {"nodes": final_nodes, "edges": edges}
@@ -1,5 +1,7 @@
 import asyncio
-from typing import List
+import heapq
+import operator
+from typing import List, AsyncIterator
 
 import structlog
 
@@ -7,7 +9,9 @@ from kw2graph import config
 from kw2graph.domain.base import ServiceBase
 from kw2graph.infrastructure.openai import OpenAiRepository, OpenAiExtractionResult
 from kw2graph.usecase.input.analyze_keywords import AnalyzeKeywordsInput
-from kw2graph.usecase.output.analyze_keywords import AnalyzeKeywordsOutput, AnalyzeKeywordsOutputItem
+from kw2graph.usecase.output.analyze_keywords import (
+    AnalyzeKeywordsOutput, AnalyzeKeywordsOutputItem, AnalyzeKeywordsStreamError,
+)
 from kw2graph.util.text_formatter import TextFormatter
 
 logger = structlog.get_logger(__name__)
@@ -26,7 +30,7 @@ class KeywordsAnalyzerService(ServiceBase):
         OpenAI APIを呼び出し、キーワードと属性を抽出します。
         デフォルトでは、パフォーマンス向上のため非同期バッチ処理を使用します。
         """
-        normalized_keywords = self.formatter.normalize_titles_list(in_data.children)
+        normalized_keywords = await self.formatter.anormalize_titles_list(in_data.children)
 
         if not normalized_keywords:
             logger.warning("Normalized keywords list is empty. Skipping OpenAI call.")
@@ -48,38 +52,80 @@ class KeywordsAnalyzerService(ServiceBase):
                 normalized_keywords
             )
 
-        logger.info(f"Extracted {len(response)} related keywords")
-        parsed_output = self.parse_response(seed_keyword=in_data.seed_keyword, response=response)
-        sorted_results = sorted(
-            parsed_output.results,
-            key=lambda item: item.score,
-            reverse=True
-        )
-        # 上位 N 件に制限
-        top_n_results = sorted_results[:self.TOP_N_LIMIT]
+        logger.info("Extracted related keywords.", count=len(response), seed=in_data.seed_keyword)
+        # 上位 N 件に制限 (全件ソートせず、O(N log K) で上位のみを取り出す)
+        # 捨てられる要素のモデルを作らないよう、パース前の dict の段階で絞り込む
+        top_n_items = heapq.nlargest(self.TOP_N_LIMIT, response, key=operator.itemgetter('score'))
 
-        logger.info(f"Filtered to top {self.TOP_N_LIMIT} keywords.", count=len(top_n_results),
+        logger.info("Filtered to top keywords.", limit=self.TOP_N_LIMIT, count=len(top_n_items),
                     seed=in_data.seed_keyword)
 
-        return AnalyzeKeywordsOutput(
-            seed_keyword=in_data.seed_keyword,
-            results=top_n_results,
+        return self.parse_response(seed_keyword=in_data.seed_keyword, response=top_n_items)
+
+    async def analyze_via_batch_api(self, in_data: AnalyzeKeywordsInput) -> AnalyzeKeywordsOutput:
+        """
+        analyze の Batch API 版。結果が揃うまで数分以上かかることがあるため、バックグラウンドタスク専用です。
+        """
+        normalized_keywords = await self.formatter.anormalize_titles_list(in_data.children)
+
+        if not normalized_keywords:
+            logger.warning("Normalized keywords list is empty. Skipping OpenAI call.")
+            return AnalyzeKeywordsOutput(seed_keyword=in_data.seed_keyword, results=[])
+
+        response = await self.openai_repo.extract_related_keywords_via_batch_api(
+            in_data.seed_keyword,
+            normalized_keywords
         )
 
+        logger.info("Extracted related keywords via batch API.", count=len(response), seed=in_data.seed_keyword)
+        top_n_items = heapq.nlargest(self.TOP_N_LIMIT, response, key=operator.itemgetter('score'))
+        return self.parse_response(seed_keyword=in_data.seed_keyword, response=top_n_items)
+
+    async def analyze_stream(
+            self, in_data: AnalyzeKeywordsInput) -> AsyncIterator[AnalyzeKeywordsOutput | AnalyzeKeywordsStreamError]:
+        """
+        analyze のストリーミング版。バッチ毎に、完了した順で上位 N 件の抽出結果を返します。
+        (上位 N 件はバッチ単位で絞り込むため、全体の上位 N 件への集約は呼び出し側で行います)
+        失敗したバッチは読み飛ばさず、AnalyzeKeywordsStreamError として返します。
+        """
+        normalized_keywords = await self.formatter.anormalize_titles_list(in_data.children)
+
+        if not normalized_keywords:
+            logger.warning("Normalized keywords list is empty. Skipping OpenAI call.")
+            return
+
+        async for response in self.openai_repo.iter_extract_related_keywords_batch(
+                in_data.seed_keyword, normalized_keywords):
+            if isinstance(response, Exception):
+                # 例外の詳細 (API の応答内容など) はログにのみ残し、クライアントには種別だけを返す
+                yield AnalyzeKeywordsStreamError(
+                    keyword=in_data.seed_keyword,
+                    error=f"Failed to extract related keywords from a batch ({type(response).__name__}).",
+                )
+                continue
+            logger.info("Extracted related keywords from a batch.", count=len(response), seed=in_data.seed_keyword)
+            top_n_items = heapq.nlargest(self.TOP_N_LIMIT, response, key=operator.itemgetter('score'))
+            yield self.parse_response(seed_keyword=in_data.seed_keyword, response=top_n_items)
+
     @staticmethod
     def parse_response(seed_keyword: str, response: OpenAiExtractionResult) -> AnalyzeKeywordsOutput:
-        logger.debug(f"Parsing OpenAI response: {response}")
+        if not response:
+            return AnalyzeKeywordsOutput.model_construct(seed_keyword=seed_keyword, results=[])
 
-        results: List[AnalyzeKeywordsOutputItem] = []
-        for item in response:
-            results.append(AnalyzeKeywordsOutputItem(
+        logger.debug("Parsing OpenAI response.", response=response)
+
+        # パース済みの OpenAI レスポンスを詰め替えるだけのため、要素毎のバリデーションを省略して構築する
+        results: List[AnalyzeKeywordsOutputItem] = [
+            AnalyzeKeywordsOutputItem.model_construct(
                 keyword=item['keyword'],
                 score=item['score'],
                 iab_categories=item['iab_categories'],
                 entity_type=item['entity_type']
-            ))
+            )
+            for item in response
+        ]
 
-        return AnalyzeKeywordsOutput(
+        return AnalyzeKeywordsOutput.model_construct(
             seed_keyword=seed_keyword,
             results=results,
         )
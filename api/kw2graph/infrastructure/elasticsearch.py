@@ -1,53 +1,81 @@
+from typing import List, Dict, Any
+
 import structlog
 from elastic_transport import ObjectApiResponse
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch
 
 from kw2graph import config
 from kw2graph.infrastructure.base import RepositoryBase
+from kw2graph.infrastructure.elasticsearch_manager import GLOBAL_ELASTICSEARCH_MANAGER
 
 logger = structlog.get_logger(__name__)
 
 
 class ElasticsearchRepository(RepositoryBase):
     RESULTS_SIZE = 100
+    # 後段で利用するのは hits.hits._source のみのため、レスポンスのエンベロープを削る
+    # (ヒットが0件の場合、hits.hits キー自体がレスポンスから省略される点に注意)
+    SEARCH_FILTER_PATH = 'hits.hits._source,hits.total.value'
+    MSEARCH_FILTER_PATH = 'responses.hits.hits._source,responses.hits.total.value,responses.error'
 
     def __init__(self, settings: config.Settings):
         super().__init__(settings)
-        logger.info("Initializing ElasticsearchClient", es_host=settings.es_host)
-        self.host = settings.es_host
-        self.api_key = settings.es_api_key
-        self.client = Elasticsearch(
-            hosts=[self.host],
-            api_key=self.api_key
-        )
+        # クライアントはプロセス全体で共有し、リクエスト毎にコネクションプールを作り直さない
+        self.client: AsyncElasticsearch = GLOBAL_ELASTICSEARCH_MANAGER.get_client()
 
-    async def search(self, index, field, keyword, size=RESULTS_SIZE) -> ObjectApiResponse:
-        query_dsl = {
-            "match": {
-                field: keyword
-            }
+    @staticmethod
+    def _build_search_body(field, keyword, size, source_fields: List[str] | None = None) -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "query": {
+                "match": {
+                    field: keyword
+                }
+            },
+            "size": size,
+            "sort": [
+                {"_score": {"order": "desc"}}
+            ]
         }
+        if source_fields is not None:
+            # 必要なフィールドのみ返させ、転送量とデコードコストを削減する
+            body["_source"] = source_fields
+
+        return body
 
-        response = self.client.search(
+    async def search(self, index, field, keyword, size=RESULTS_SIZE,
+                     source_fields: List[str] | None = None) -> ObjectApiResponse:
+        """
+        :param source_fields: 返却する _source のフィールド (None の場合はドキュメント全体を返す)
+        """
+        response = await self.client.search(
             index=index,
-            query=query_dsl,
-            size=self.RESULTS_SIZE,
-            sort=[
-                {"_score": {"order": "desc"}}
-            ]
+            filter_path=self.SEARCH_FILTER_PATH,
+            **self._build_search_body(field, keyword, size, source_fields)
         )
 
         return response
 
-    def analyze(self, index, text):
-        body = {
-            'analyzer': 'kuromoji',
-            'text': text
-        }
+    async def msearch(self, index, field, keywords: List[str], size=RESULTS_SIZE,
+                      source_fields: List[str] | None = None) -> ObjectApiResponse:
+        """
+        複数キーワードの検索を1回の msearch リクエストにまとめて実行します。
+        レスポンスの 'responses' は keywords と同じ順序で返されます。
+        """
+        searches: List[Dict[str, Any]] = []
+        for keyword in keywords:
+            # msearch はヘッダー行とボディ行のペアで構成される
+            searches.append({"index": index})
+            searches.append(self._build_search_body(field, keyword, size, source_fields))
+
+        response = await self.client.msearch(searches=searches, filter_path=self.MSEARCH_FILTER_PATH)
+
+        return response
 
-        response = self.client.indices.analyze(
+    async def analyze(self, index, text):
+        response = await self.client.indices.analyze(
             index=index,
-            body=body
+            analyzer='kuromoji',
+            text=text
         )
 
         return response
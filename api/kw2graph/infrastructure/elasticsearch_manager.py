@@ -0,0 +1,63 @@
+import structlog
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.serializer import OrjsonSerializer
+
+from kw2graph import config
+
+logger = structlog.get_logger(__name__)
+
+
+class ElasticsearchClientManager:
+    """
+    AsyncElasticsearch Clientの生成と破棄を管理し、Clientインスタンスを提供するクラス。
+    FastAPIのライフサイクルイベント（startup/shutdown）からのみ利用される。
+    """
+
+    # 同時リクエスト数に合わせた aiohttp のノード毎コネクションプールサイズ
+    # (elasticsearch-py 8 以降は maxsize ではなく connections_per_node で指定する)
+    MAX_CONNECTIONS = 100
+    # 1リクエストあたりのタイムアウト (秒)。タイムアウト時は別ノード/再接続でリトライする
+    REQUEST_TIMEOUT = 5
+
+    def __init__(self):
+        self._client: AsyncElasticsearch | None = None
+
+    def initialize(self, settings: config.Settings):
+        """AsyncElasticsearchクライアントを初期化します。"""
+        if self._client:
+            logger.warning("ElasticsearchClientManager is already initialized.")
+            return
+
+        logger.info("Initializing AsyncElasticsearch Client.", es_host=settings.es_host)
+
+        self._client = AsyncElasticsearch(
+            hosts=[settings.es_host],
+            api_key=settings.es_api_key,
+            connections_per_node=self.MAX_CONNECTIONS,
+            http_compress=True,
+            request_timeout=self.REQUEST_TIMEOUT,
+            retry_on_timeout=True,
+            # レスポンス (最大100件の _source) のデコードを C 実装の orjson で行う
+            serializer=OrjsonSerializer(),
+        )
+
+    async def close(self):
+        """AsyncElasticsearchクライアントを明示的にクローズします。"""
+        if self._client:
+            logger.info("Closing AsyncElasticsearch Client.")
+            try:
+                await self._client.close()
+                self._client = None
+            except Exception as e:
+                logger.error("Error during Elasticsearch client close.", error=str(e))
+
+    def get_client(self) -> AsyncElasticsearch:
+        """初期化済みのAsyncElasticsearch Clientインスタンスを返します。"""
+        if not self._client:
+            # 起動イベントで初期化されることを前提としているため、通常は発生しない
+            raise RuntimeError("Elasticsearch Client is not initialized. Check startup event configuration.")
+        return self._client
+
+
+# 💡 アプリケーション全体で共有するマネージャーインスタンス
+GLOBAL_ELASTICSEARCH_MANAGER = ElasticsearchClientManager()
@@ -1,27 +1,136 @@
 import structlog
 import asyncio
-from typing import List, Dict, Any, Set
+import random
+from functools import lru_cache
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Dict, Any, AsyncIterator
 
-from gremlin_python.driver import client, serializer
 from gremlin_python.driver.client import Client
+from gremlin_python.driver.protocol import GremlinServerError
 from gremlin_python.driver.resultset import ResultSet
-from gremlin_python.process.graph_traversal import __
+from gremlin_python.statics import BigDecimal
 
 from kw2graph import config
 from kw2graph.infrastructure.base import RepositoryBase
+from kw2graph.util.cache import LruCache, TtlLruCache
 
 logger = structlog.get_logger(__name__)
 
 # 関連語句の抽出結果の型定義
 ExtractionResult = List[Dict[str, Any]]
+
+
+@dataclass(frozen=True, slots=True)
+class RegistrationItem:
+    """登録用に正規化した関連キーワード 1 件 (抽出結果の既定値補完後。リポジトリ内部でのみ使用する)"""
+    keyword: str
+    score: float
+    entity_type: str
+    # リスト型プロパティは Gremlin で multi-property として格納される
+    iab_categories: List[str]
+    original_name: str
+    # Categoryノード用の名前 (IABカテゴリの最初の要素。なければ None)
+    category: str | None
+
+
 # 表示用のグラフ構造の型を定義
 GraphData = Dict[str, List[Dict[str, Any]]]
 
 
+# -----------------------------------------------------------------
+# レスポンス整形ヘルパー
+# 大きなグラフでは I/O 後の整形がボトルネックになるため、メソッド/属性参照を避けたモジュール関数として定義する
+# -----------------------------------------------------------------
+
+def _as_category_list(iab_categories_raw: Any) -> List[str]:
+    """iab_categories がリストでない (単一の文字列である) 場合などを含め、常にリストに揃える"""
+    if iab_categories_raw is None:
+        # Gremlinから何も返されなかった場合（属性なしノード）
+        return []
+    if isinstance(iab_categories_raw, str):
+        # 単一の文字列が返された場合（プロパティが一つだけの場合）
+        return [iab_categories_raw]
+    if not isinstance(iab_categories_raw, list):
+        # リストでないが None/str でもない予期せぬ型の場合、リストに変換 (安全策)
+        return [str(iab_categories_raw)]
+    # 既にリストである場合
+    return iab_categories_raw
+
+
+def _bigdecimal_to_float(score_value: BigDecimal) -> float:
+    # BigDecimalをfloatに変換
+    # GraphBinary (BigDecimalIO) / GraphSON のどちらでも、Java の BigDecimal は decimal.Decimal ではなく
+    # gremlin_python.statics.BigDecimal (scale / unscaled_value を持つだけの型で、float() では変換できない) として返される
+    # (unscaled * 10^-scale を Decimal 上で正確に求め、float への丸めは1回だけにする)
+    return float(Decimal(score_value.unscaled_value).scaleb(-score_value.scale))
+
+
+def _score_to_float(score_value: Any) -> float:
+    """型が混在していても変換できる汎用版 (BigDecimal を含む結果向け)"""
+    # 大半を占める float / int は type() の同一性比較で先に返す
+    value_type = type(score_value)
+    if value_type is float:
+        return score_value
+    if value_type is int:
+        return float(score_value)
+    if isinstance(score_value, BigDecimal):
+        return _bigdecimal_to_float(score_value)
+    # それ以外の数値型 (long など) は C 実装の float() で直接変換する
+    return float(score_value)
+
+
+def _float_or_bigdecimal(score_value: Any) -> float:
+    """数値型を前提とした高速版。まれに BigDecimal が混在した場合のみ例外経由で変換する"""
+    if type(score_value) is float:
+        return score_value
+    try:
+        return float(score_value)
+    except TypeError:
+        return _bigdecimal_to_float(score_value)
+
+
+def _format_nodes(raw_nodes: List[Dict[str, Any]], group: str) -> List[Dict[str, Any]]:
+    """project('id', 'name', 'entity_type', 'iab_categories', 'original_name') の結果を表示用ノードに整形する"""
+    # 内包表記のループ内で参照する組み込み/モジュール関数はローカル変数に束縛し、グローバル名前解決を省く
+    to_str = str
+    as_category_list = _as_category_list
+    return [
+        {
+            "id": to_str(item['id']),
+            "label": item['name'],
+            "group": group,
+            "entity_type": item['entity_type'],
+            "iab_categories": as_category_list(item['iab_categories']),
+            "original_name": item['original_name']
+        }
+        for item in raw_nodes
+    ]
+
+
+def _format_edges(raw_edges: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """project('id', 'score', 'from_id', 'to_id') の結果を表示用エッジに整形する"""
+    if not raw_edges:
+        return []
+
+    # スコアの型は結果全体でほぼ一定のため、先頭要素で変換関数を一度だけ選び、要素毎の型判定を省く
+    convert = _score_to_float if isinstance(raw_edges[0]['score'], BigDecimal) else _float_or_bigdecimal
+    to_str = str
+    return [
+        {
+            "id": to_str(item['id']),
+            "from_node": to_str(item['from_id']),
+            "to_node": to_str(item['to_id']),
+            "score": convert(item['score'])
+        }
+        for item in raw_edges
+    ]
+
+
 class GraphDatabaseRepository(RepositoryBase):
     """
     Gremlin互換のグラフデータベースに接続するリポジトリ。
-    I/Oはasyncio.to_thread()を使って非同期ループから分離する。
+    I/Oは submit_async() の Future を asyncio.wrap_future() で await し、イベントループをブロックしない。
     """
 
     NODE_LABEL_KEYWORD = 'Keyword'
@@ -31,110 +140,196 @@ class GraphDatabaseRepository(RepositoryBase):
     EDGE_LABEL_IS_A = 'IS_A'
     EDGE_LABEL_BELONGS_TO = 'BELONGS_TO'
 
+    # (label, name) -> vertex id。リポジトリはリクエスト毎に生成されるため、クラス属性としてプロセス全体で共有する
+    NODE_ID_CACHE_SIZE = 100_000
+    _node_id_cache: LruCache[tuple[str, str], Any] = LruCache(maxsize=NODE_ID_CACHE_SIZE)
+
+    # fetch_related_graph の結果キャッシュ (引数タプル -> GraphData) と、実行中トラバーサルの Future
+    GRAPH_CACHE_SIZE = 1024
+    GRAPH_CACHE_TTL_SECONDS = 30
+    _graph_cache: TtlLruCache[tuple, GraphData] = TtlLruCache(maxsize=GRAPH_CACHE_SIZE, ttl=GRAPH_CACHE_TTL_SECONDS)
+    _graph_inflight: Dict[tuple, asyncio.Future] = {}
+
+    # fetch_related_graph の探索上限 (深さ / 1ホップあたりのフロンティア頂点数)
+    MAX_DEPTH = 3
+    MAX_FRONTIER = 5000
+
+    # 並行書き込みの競合 (ConcurrentModificationException) 時の再試行回数と、バックオフの基準秒数
+    WRITE_RETRY_ATTEMPTS = 3
+    WRITE_RETRY_BASE_DELAY_SECONDS = 0.05
+
+    # _stream_gremlin (新規キーワード探索) で受信キューを確認する間隔と、サーバーに要求する 1 ページあたりの件数
+    STREAM_POLL_INTERVAL_SECONDS = 0.005
+    STREAM_BATCH_SIZE = 512
+
+    # プロバイダ毎の traversal source。未登録のプロバイダは素の 'g' を使う
+    # (JanusGraph は name / original_name の composite index があればヒント不要、Cosmos DB も指定なし)
+    TRAVERSAL_SOURCES: Dict[str, str] = {
+        # Neptune では repeat を幅優先で展開させる
+        'neptune': "g.withSideEffect('Neptune#repeatMode', 'BFS')",
+    }
+    WARMUP_KEYWORD = '__warmup__'
+
     def __init__(self, settings: config.Settings, client_instance: Client):
         super().__init__(settings)
-        self.endpoint = settings.graphdb_host
-        self.port = settings.graphdb_port
-        self.url = f'ws://{self.endpoint}:{self.port}/gremlin'
-
-        logger.info("Initializing GraphDatabaseRepository (Thread-Safe Client)", url=self.url)
+        # Client (コネクションプール) は GremlinClientManager がプロセスで1つだけ生成したものを共有する。
+        # リポジトリ自身は接続を作らないため、リクエスト毎に生成しても WebSocket ハンドシェイクは発生しない
         self.client: Client = client_instance
+        # 読み取りトラバーサル用の traversal source (プロバイダ固有のヒントを付与する)
+        self.g_prefix = self.TRAVERSAL_SOURCES.get(settings.graphdb_provider, "g")
+
+    # --- 非同期 Gremlin I/O実行メソッド ---
 
-    # --- 同期 Gremlin I/O実行メソッド ---
-    def _sync_execute_gremlin(self, query: str) -> List[Any]:
-        """Gremlinクエリを同期的に実行します。"""
+    async def _execute_gremlin(self, query: str, bindings: Dict[str, Any] | None = None) -> List[Any]:
+        """
+        Gremlinクエリを submit_async で送信し、結果を asyncio から await します。
+        bindings はサーバー側で変数として評価されます。
+        """
         if not self.client:
             raise ConnectionError("Gremlin Client is not initialized.")
 
         try:
-            results: ResultSet = self.client.submit(query)
-            return results.all().result()
+            # submit_async / ResultSet.all() はどちらも concurrent.futures.Future を返すため、
+            # wrap_future でイベントループをブロックせずに待機する
+            results: ResultSet = await asyncio.wrap_future(self.client.submit_async(query, bindings))
+            return await asyncio.wrap_future(results.all())
         except Exception as e:
-            logger.error("Synchronous Gremlin query execution failed.", query=query, error=str(e))
+            logger.error("Gremlin query execution failed.", query=query, error=str(e))
             raise
 
-    # --- 非同期ラッパーメソッド ---
-
-    async def _execute_gremlin(self, query: str) -> List[Any]:
-        """非同期でスレッドプールにGremlin I/Oを投げる"""
-        try:
-            return await asyncio.to_thread(self._sync_execute_gremlin, query)
-        except Exception as e:
-            raise e
-
-    async def upsert_node(self, label: str, name: str, properties: Dict[str, Any] = None) -> str:
+    async def warmup(self) -> None:
         """
-        指定されたラベルのノードをUpsertし、そのIDを返します。
-        ノードが存在する場合も、propertiesを上書き更新します。
+        起動時に 1 度だけ、起点ノードの検索 (has(label, 'name' / 'original_name', ...)) の実行計画を取得してログに出力します。
+        インデックスが使われているか (全頂点スキャンになっていないか) を運用者が確認するためのもので、
+        失敗しても起動は継続します (Neptune など explain() ステップを提供しないプロバイダもあるため)。
         """
-        properties = properties or {}
-
-        # 1. プロパティ更新用の Gremlin ステップを構築 (prop_parts)
-        prop_parts = ""
-        for key, value in properties.items():
-
-            if isinstance(value, list):
-                # iab_categoriesなどのマルチプロパティ対応: 各要素に対して property() を繰り返す
-                for item in value:
-                    # Gremlin構文: .property('key', 'value')
-                    quoted_item = f"'{item}'"
-                    prop_parts += f".property('{key}', {quoted_item})"
-
-            elif isinstance(value, str):
-                # entity_typeなどのシングルプロパティ
-                gremlin_value = f"'{value}'"
-                prop_parts += f".property('{key}', {gremlin_value})"
+        bindings = {'kwLabel': self.NODE_LABEL_KEYWORD, 'seed': self.WARMUP_KEYWORD}
+        for key in ('name', 'original_name'):
+            # TraversalExplanation はシリアライザによっては返せないため、サーバー側で文字列化する
+            query = f"{self.g_prefix}.V().has(kwLabel, '{key}', seed).explain().prettyPrint()"
+            try:
+                plan = await self._execute_gremlin(query, bindings)
+            except Exception as e:
+                logger.warning("Gremlin warmup explain() failed.", key=key, error=str(e))
+                continue
+            logger.info("Gremlin seed lookup plan.", provider=self.settings.graphdb_provider, key=key, plan=plan)
+
+    async def _execute_with_retry(self, query: str, bindings: Dict[str, Any] | None = None) -> List[Any]:
+        """
+        冪等な書き込みスクリプト用の _execute_gremlin。並行書き込みの競合で失敗した場合のみ、
+        ジッター付きの指数バックオフで WRITE_RETRY_ATTEMPTS 回まで再送します。
+        """
+        for attempt in range(self.WRITE_RETRY_ATTEMPTS):
+            try:
+                return await self._execute_gremlin(query, bindings)
+            except GremlinServerError as e:
+                if 'ConcurrentModificationException' not in str(e) or attempt == self.WRITE_RETRY_ATTEMPTS - 1:
+                    raise
+                delay = self.WRITE_RETRY_BASE_DELAY_SECONDS * (2 ** attempt + random.random())
+                logger.warning("Gremlin write conflicted; retrying.", attempt=attempt + 1, delay=delay)
+                await asyncio.sleep(delay)
+
+    async def _stream_gremlin(self, query: str, bindings: Dict[str, Any] | None = None) -> AsyncIterator[Any]:
+        """
+        Gremlinクエリの結果を、サーバーから届いたページ (バッチ) 単位で順に返す非同期ジェネレータ。
+        全件を 1 つのリストへ連結する ResultSet.all() と異なり、受信済みのページから処理を始められます。
+        """
+        if not self.client:
+            raise ConnectionError("Gremlin Client is not initialized.")
 
-            else:
-                # 数値などのプリミティブ型
-                gremlin_value = str(value)
-                prop_parts += f".property('{key}', {gremlin_value})"
-
-        # 2. Gremlin Upsert クエリの構築: 検索/作成後に属性を適用 (FINAL FIX)
-        upsert_query = (
-            f"g.V().has('{label}', 'name', '{name}')"
-            f".fold().coalesce("
-            f"  unfold(),"  # 既存ノードを見つける
-            f"  addV('{label}').property('name', '{name}')"  # ノードがなければ 'name' のみで新規作成
-            f")"
-            f"{prop_parts}"  # ★ 修正: coalesce の外で、既存ノードまたは新規ノードの両方にプロパティを適用
-            f".id()"  # 最終的にノードのIDを返す
-        )
+        try:
+            # batchSize を指定し、サーバーが結果を小さいページに分けて順次フラッシュするようにする
+            results: ResultSet = await asyncio.wrap_future(self.client.submit_async(
+                query, bindings, request_options={'batchSize': self.STREAM_BATCH_SIZE}))
+        except Exception as e:
+            logger.error("Gremlin query execution failed.", query=query, error=str(e))
+            raise
 
+        # ResultSet.one() はビジーウェイトするため使わず、受信キュー (stream) を直接読み出す
+        done = asyncio.wrap_future(results.done)
+        while True:
+            while not results.stream.empty():
+                for item in results.stream.get_nowait():
+                    yield item
+            if done.done():
+                break
+            await asyncio.wait({done}, timeout=self.STREAM_POLL_INTERVAL_SECONDS)
+
+        # 完了後に残ったページを読み切り、エラーで終了していれば例外を送出する
+        while not results.stream.empty():
+            for item in results.stream.get_nowait():
+                yield item
         try:
-            results = await self._execute_gremlin(upsert_query)
-            return str(results[0]) if results else None
+            done.result()
         except Exception as e:
-            logger.error("Synchronous Gremlin query execution failed.", query=upsert_query, error=str(e))
+            logger.error("Gremlin query execution failed.", query=query, error=str(e))
             raise
 
     # -----------------------------------------------------------------
-    # ★ 修正: エッジ Upsert メソッドを分離・汎用化 (汎用化)
+    # 一括登録: シード/チャンネル/関連キーワード/カテゴリを 1 回のスクリプト送信で Upsert する
     # -----------------------------------------------------------------
 
-    async def upsert_edge(self, from_id: str, to_id: str, label: str, score: float = None) -> None:
-        """
-        2つのノード間にエッジをUpsertします。
-        """
-        # エッジのプロパティとしてスコアを含めるか判断
-        score_prop = f".property('score', {score})" if score is not None else ""
-
-        # Gremlin Edge Upsert クエリの構築
-        edge_upsert_query = (
-            f"g.V('{from_id}').as('a').V('{to_id}').coalesce("
-            # 1. 既存エッジを探す
-            f"  inE('{label}').where(outV().is('a')),"
-            # 2. なければ新しいエッジを作成し、プロパティを設定
-            f"  addE('{label}').from('a')"
-            # 3. どちらの場合もスコアプロパティを更新（scoreがない場合は更新しない）
-            f"){score_prop}"
-        )
-
-        await self._execute_gremlin(edge_upsert_query)
-
-    # -----------------------------------------------------------------
-    # ★ 修正: メイン登録メソッドのロジック変更 (DIによるノード/エッジ登録)
-    # -----------------------------------------------------------------
+    # 値はすべて bindings で渡すため、スクリプト本文は常に同一 (サーバー側でコンパイル済みスクリプトが再利用される)
+    BULK_REGISTER_SCRIPT = """
+        def ids = []
+
+        // lookupNames (ラベル -> 名前リスト) の既存頂点 ID を、ラベル毎に 1 回の within() 検索でまとめて取得する
+        def found = [:]
+        lookupNames.each { lbl, nms ->
+            def m = [:]
+            g.V().has(lbl, 'name', within(nms)).project('name', 'id').by('name').by(id()).toList()
+                    .each { r -> m[r['name']] = r['id'] }
+            found[lbl] = m
+        }
+
+        def upsert = { String lbl, String nm ->
+            // キャッシュ済み ID は、その ID の頂点が同じ (label, name) のまま残っている場合のみ採用する
+            // (頂点の削除や ID の再利用で別の頂点を指していた場合は、下の検索/作成にフォールバックする)
+            def knownId = known[lbl]?.get(nm)
+            def v = knownId != null ? g.V(knownId).has(lbl, 'name', nm).tryNext().orElse(null) : null
+            if (v == null) {
+                // 一括検索でヒットした名前は ID 参照。ミスした名前 (失効したキャッシュ ID を含む) は、
+                // 並行する登録が同じ名前を先に作成していても重複しないよう、mergeV で検索と作成を 1 ステップで行う
+                def foundIds = found[lbl]
+                def foundId = foundIds?.get(nm)
+                v = foundId != null ? g.V(foundId).next() : g.mergeV([(T.label): lbl, name: nm]).next()
+                if (foundIds != null) { foundIds[nm] = v.id() }
+            }
+            ids << [lbl, nm, v.id()]
+            v
+        }
+        def relate = { src, dst, String lbl, sc ->
+            def t = g.mergeE([(T.label): lbl, (Direction.OUT): src.id(), (Direction.IN): dst.id()])
+            if (sc != null) { t = t.property('score', sc) }
+            t.iterate()
+        }
+
+        def seedV = upsert(kwLabel, seed)
+        g.V(seedV).property('original_name', seed).iterate()
+
+        if (channel != null) {
+            def channelV = upsert(chLabel, channel)
+            g.V(channelV).property('platform', platform).iterate()
+            relate(seedV, channelV, belongsLabel, null)
+        }
+
+        // 並行バッチ間で重複作成されないよう、カテゴリは事前フェーズでまとめて Upsert する
+        categories.each { c -> upsert(catLabel, c) }
+
+        // 関連キーワードは列指向 (項目毎の並列リスト) で受け取り、インデックスで 1 件ずつ組み立てる
+        itemKeywords.eachWithIndex { kw, i ->
+            def v = upsert(kwLabel, kw)
+            g.V(v).property('entity_type', itemEntityTypes[i]).property('original_name', itemOriginalNames[i]).iterate()
+            itemIabCategories[i].each { c -> g.V(v).property('iab_categories', c).iterate() }
+            relate(seedV, v, relLabel, itemScores[i])
+            if (itemCategories[i] != null) {
+                relate(v, upsert(catLabel, itemCategories[i]), isaLabel, null)
+            }
+        }
+
+        // Map/List はサーバー側で展開されるため、1 件の結果として返すよう外側のリストで包む
+        [ids]
+    """
 
     async def register_related_keywords(self,
                                         seed_keyword: str,
@@ -142,67 +337,101 @@ class GraphDatabaseRepository(RepositoryBase):
                                         channel_name: str = None) -> bool:  # ★ チャンネル名パラメータ追加
         """
         GPTから抽出されたデータとチャネル名をグラフに登録します。
+        ノード/エッジの Upsert はスクリプト送信でまとめて実行されます。
+        キーワード数が graphdb_write_batch_size 以下であれば 1 round-trip、
+        それを超える場合はチャンク単位のスクリプトを graphdb_write_concurrency 件まで並行に送信します。
         """
         logger.info("Starting registration to GraphDB.", seed_keyword=seed_keyword)
 
-        try:
-            # 1. シードキーワードノードのUpsert
-            seed_node_id = await self.upsert_node(
-                self.NODE_LABEL_KEYWORD,
-                seed_keyword,
-                properties={'original_name': seed_keyword}
-            )
-            if not seed_node_id:
-                logger.error("Failed to upsert seed keyword node.", keyword=seed_keyword)
-                return False
-
-            # 2. チャンネルノードと BELONGS_TO エッジの Upsert (サービス固有のドメイン知識)
-            if channel_name:
-                channel_node_id = await self.upsert_node(self.NODE_LABEL_CHANNEL, channel_name, {'platform': 'YouTube'})
-                if channel_node_id:
-                    # シードキーワードからチャンネルへの関連付け (スコアは不要)
-                    await self.upsert_edge(seed_node_id, channel_node_id, self.EDGE_LABEL_BELONGS_TO)
-
-            # 3. 各関連キーワードの Upsert とエッジ作成
-            for item in extracted_data:
-                related_keyword = item['keyword']
-                score = item['score']
-                entity_type = item.get('entity_type', 'General')  # 存在しない場合は 'General'
-                iab_categories = item.get('iab_categories', [])  # 存在しない場合は空リスト
-
-                original_name = item.get('original_name', related_keyword.split(' (')[0].strip())  # ない場合は括弧前を取得
+        # 表記揺れ (大文字小文字・前後空白) を含む重複キーワードは、スコアが最大のものだけを登録する
+        best: Dict[str, Dict[str, Any]] = {}
+        for item in extracted_data:
+            key = item['keyword'].strip().casefold()
+            prev = best.get(key)
+            if prev is None or item['score'] > prev['score']:
+                best[key] = item
+
+        items: List[RegistrationItem] = []
+        for item in best.values():
+            related_keyword = item['keyword']
+            iab_categories = item.get('iab_categories') or []  # 存在しない場合は空リスト
+
+            items.append(RegistrationItem(
+                keyword=related_keyword,
+                score=item['score'],
+                entity_type=item.get('entity_type', 'General'),  # 存在しない場合は 'General'
+                iab_categories=iab_categories,
+                original_name=item.get('original_name', related_keyword.split(' (')[0].strip()),  # ない場合は括弧前を取得
                 # Categoryノード用の名前を取得（IABカテゴリの最初の要素をカテゴリ名として利用する）
-                category_name = iab_categories[0] if iab_categories else None
-
-                # ノードに渡すプロパティを構築
-                node_properties = {
-                    'entity_type': entity_type,
-                    # リスト型プロパティは Gremlin で multi-property として格納される
-                    'iab_categories': iab_categories,
-                    'original_name': original_name,
-                }
-
-                # A. 関連キーワードノードのUpsert
-                # ★ 修正: 属性を渡してノードをUpsert
-                related_node_id = await self.upsert_node(
-                    self.NODE_LABEL_KEYWORD,
-                    related_keyword,
-                    properties=node_properties
+                category=iab_categories[0] if iab_categories else None,
+            ))
+
+        return await self._register_items(seed_keyword, items, channel_name)
+
+    async def register_related_keywords_columnar(self,
+                                                 seed_keyword: str,
+                                                 keywords: List[str],
+                                                 scores: List[float],
+                                                 iab_categories: List[List[str]],
+                                                 entity_types: List[str],
+                                                 channel_name: str = None) -> bool:
+        """
+        register_related_keywords の列指向版。関連キーワードを項目毎の並列リストで受け取り、
+        要素毎の dict を経由せずに登録します (original_name は括弧書きの前の部分を使用します)。
+        """
+        logger.info("Starting registration to GraphDB.", seed_keyword=seed_keyword)
+
+        # 表記揺れ (大文字小文字・前後空白) を含む重複キーワードは、スコアが最大のものだけを登録する
+        best: Dict[str, RegistrationItem] = {}
+        for keyword, score, categories, entity_type in zip(keywords, scores, iab_categories, entity_types):
+            key = keyword.strip().casefold()
+            prev = best.get(key)
+            if prev is None or score > prev.score:
+                categories = categories or []
+                best[key] = RegistrationItem(
+                    keyword=keyword,
+                    score=score,
+                    entity_type=entity_type,
+                    iab_categories=categories,
+                    original_name=keyword.split(' (')[0].strip(),
+                    category=categories[0] if categories else None,
                 )
 
-                if related_node_id:
-                    # B. RELATED_TO エッジのUpsert (GPTスコアを使用)
-                    await self.upsert_edge(seed_node_id, related_node_id, self.EDGE_LABEL_RELATED, score=score)
+        return await self._register_items(seed_keyword, list(best.values()), channel_name)
 
-                    # C. IS_A エッジのUpsert (カテゴリ階層: IABのTier 1をCategoryノードとして利用)
-                    if category_name:
-                        # CategoryノードのUpsert (カテゴリ名は IAB Tier 1 を利用)
-                        category_node_id = await self.upsert_node(self.NODE_LABEL_CATEGORY, category_name)
-                        if category_node_id:
-                            # 関連キーワードからカテゴリへの階層エッジを登録 (スコアは不要)
-                            await self.upsert_edge(related_node_id, category_node_id, self.EDGE_LABEL_IS_A)
+    async def _register_items(self,
+                              seed_keyword: str,
+                              items: List[RegistrationItem],
+                              channel_name: str | None) -> bool:
+        """正規化済みの関連キーワードを、件数に応じて 1 回または並行のチャンク送信で登録します。"""
+        batch_size = self.settings.graphdb_write_batch_size
 
-            logger.info("GraphDB registration finished successfully.", seed_keyword=seed_keyword)
+        try:
+            if len(items) <= batch_size:
+                # 小さい登録は従来どおり 1 回のスクリプト送信で完結させる
+                if not await self._submit_registration(seed_keyword, channel_name, items):
+                    return False
+            else:
+                # 1. シード/チャンネル/全カテゴリを先に Upsert し、頂点 ID をキャッシュに載せる
+                categories = list(dict.fromkeys(item.category for item in items if item.category))
+                if not await self._submit_registration(seed_keyword, channel_name, [], categories):
+                    return False
+
+                # 2. 関連キーワードをチャンク分割し、同時実行数を制限して並行に送信する
+                #    (巨大なスクリプトによるフレーム上限超過・サーバーメモリ圧迫を避ける)
+                semaphore = asyncio.Semaphore(self.settings.graphdb_write_concurrency)
+
+                async def run_batch(chunk: List[RegistrationItem]) -> bool:
+                    async with semaphore:
+                        return await self._submit_registration(seed_keyword, None, chunk)
+
+                results = await asyncio.gather(*(
+                    run_batch(items[i:i + batch_size]) for i in range(0, len(items), batch_size)
+                ))
+                if not all(results):
+                    return False
+
+            logger.info("GraphDB registration finished successfully.", seed_keyword=seed_keyword, count=len(items))
             return True
 
         except Exception as e:
@@ -210,6 +439,74 @@ class GraphDatabaseRepository(RepositoryBase):
                          error=str(e))
             return False
 
+    async def _submit_registration(self,
+                                   seed_keyword: str,
+                                   channel_name: str | None,
+                                   items: List[RegistrationItem],
+                                   categories: List[str] | None = None) -> bool:
+        """BULK_REGISTER_SCRIPT を 1 回送信し、登録した頂点 ID をキャッシュします。"""
+        categories = categories or []
+
+        # キャッシュ済みの頂点 ID をラベル毎に渡し、サーバー側の name 検索を省略させる
+        known: Dict[str, Dict[str, Any]] = {}
+        lookups = [(self.NODE_LABEL_KEYWORD, seed_keyword)]
+        if channel_name:
+            lookups.append((self.NODE_LABEL_CHANNEL, channel_name))
+        for category in categories:
+            lookups.append((self.NODE_LABEL_CATEGORY, category))
+        for item in items:
+            lookups.append((self.NODE_LABEL_KEYWORD, item.keyword))
+            if item.category:
+                lookups.append((self.NODE_LABEL_CATEGORY, item.category))
+        # キャッシュにない名前は、スクリプト冒頭でラベル毎 (Keyword/Category/Channel) に within() で一括検索する
+        lookup_names: Dict[str, List[str]] = {}
+        for label, name in lookups:
+            vertex_id = self._node_id_cache.get((label, name))
+            if vertex_id is not None:
+                known.setdefault(label, {})[name] = vertex_id
+            else:
+                lookup_names.setdefault(label, []).append(name)
+        lookup_names = {label: list(dict.fromkeys(names)) for label, names in lookup_names.items()}
+
+        bindings = {
+            'known': known,
+            'lookupNames': lookup_names,
+            'kwLabel': self.NODE_LABEL_KEYWORD,
+            'catLabel': self.NODE_LABEL_CATEGORY,
+            'chLabel': self.NODE_LABEL_CHANNEL,
+            'relLabel': self.EDGE_LABEL_RELATED,
+            'isaLabel': self.EDGE_LABEL_IS_A,
+            'belongsLabel': self.EDGE_LABEL_BELONGS_TO,
+            'seed': seed_keyword,
+            'channel': channel_name,
+            'platform': 'YouTube',
+            'categories': categories,
+            # 要素毎に同じキー名を繰り返す dict のリストではなく、項目毎のリストで送ってペイロードを小さくする
+            'itemKeywords': [item.keyword for item in items],
+            'itemScores': [item.score for item in items],
+            'itemEntityTypes': [item.entity_type for item in items],
+            'itemOriginalNames': [item.original_name for item in items],
+            'itemIabCategories': [item.iab_categories for item in items],
+            'itemCategories': [item.category for item in items],
+        }
+
+        # スクリプトは Upsert のみで構成され冪等なため、競合時は同じ bindings のまま再送できる
+        results = await self._execute_with_retry(self.BULK_REGISTER_SCRIPT, bindings)
+        if not results:
+            logger.error("Failed to upsert seed keyword node.", keyword=seed_keyword)
+            return False
+
+        # 以降の登録で name 検索を省略できるよう、登録した頂点 ID をキャッシュする
+        # (失効していたキャッシュ ID も、スクリプト側で解決し直した ID でここで置き換わる)
+        for label, name, vertex_id in results[0]:
+            self._node_id_cache.set((label, name), vertex_id)
+
+        # 書き込みはシード以外のキーワードを起点とする近傍 (深さ 2 以上) も変えるため、
+        # seed 単位ではなくグラフ取得キャッシュ全体を破棄して古い結果を返さないようにする
+        self._graph_cache.clear()
+
+        return True
+
     # --- グラフ取得メソッド ---
 
     async def fetch_related_graph(
@@ -220,13 +517,60 @@ class GraphDatabaseRepository(RepositoryBase):
             entity_type: str | None = None,
             iab_category: str | None = None
     ) -> GraphData:
-        logger.info("Fetching graph data with filters.",
-                    seed_keyword=seed_keyword,
-                    max_depth=max_depth,
-                    min_score=min_score,
-                    entity_type=entity_type,
-                    iab_category=iab_category)
-
+        """
+        シードキーワードを起点とした関連グラフを取得します。
+        同一引数の結果は GRAPH_CACHE_TTL_SECONDS 秒間キャッシュし、
+        同時に発生した同一引数のキャッシュミスは 1 回のトラバーサルにまとめます。
+        (戻り値はキャッシュと共有されるため、呼び出し側で変更しないこと)
+        """
+        if max_depth > self.MAX_DEPTH:
+            # 探索コストは O(fan-out^depth) で増えるため、深さに上限を設けてサーバーの占有を防ぐ
+            logger.warning("max_depth exceeds the limit. Clamped.", requested=max_depth, max_depth=self.MAX_DEPTH)
+            max_depth = self.MAX_DEPTH
+
+        key = (seed_keyword, max_depth, min_score, entity_type, iab_category)
+        while True:
+            cached = self._graph_cache.get(key)
+            if cached is not None:
+                logger.debug("Graph cache hit.", seed_keyword=seed_keyword)
+                return cached
+
+            # 同一キーのトラバーサルが実行中であれば、その結果を待つ
+            inflight = self._graph_inflight.get(key)
+            if inflight is None:
+                break
+            result = await asyncio.shield(inflight)
+            if result is not None:
+                return result
+            # 実行中の呼び出しがキャンセルされた (None が渡された) 場合は、キャッシュ確認からやり直して自身で取得する
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._graph_inflight[key] = future
+        try:
+            try:
+                result = await self._fetch_related_graph_uncached(*key)
+            except Exception as e:
+                logger.error("Failed to fetch graph data from Gremlin (Filtered Query).", error=str(e))
+                # 失敗結果はキャッシュしない
+                result = {"nodes": [], "edges": []}
+            else:
+                self._graph_cache.set(key, result)
+            future.set_result(result)
+            return result
+        finally:
+            # キャンセル等で結果を設定できなかった場合は、Future をキャンセルせず None を渡す
+            # (待機中の呼び出しまで CancelledError で失敗させず、それぞれに再取得させるため)
+            if not future.done():
+                future.set_result(None)
+            self._graph_inflight.pop(key, None)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_graph_query(g_prefix: str, filter_entity_type: bool, filter_iab_category: bool) -> str:
+        """
+        fetch_related_graph のトラバーサル本文を組み立てます。
+        値はすべて bindings で渡すため、本文は (traversal source, フィルタの有無) だけで決まり、結果はキャッシュされます。
+        """
         # フィルタリング条件のGremlinクエリ部品を構築
 
         # 1. ノードフィルタ部品 (entity_type, iab_category)
@@ -234,345 +578,159 @@ class GraphDatabaseRepository(RepositoryBase):
         node_filter_parts = ""
 
         # a) entity_type フィルタ
-        if entity_type:
-            node_filter_parts += f".has('entity_type', '{entity_type}')"
+        if filter_entity_type:
+            node_filter_parts += ".has('entity_type', entityType)"
 
         # b) iab_category フィルタ (iab_categoriesはリストプロパティと仮定)
-        if iab_category:
+        if filter_iab_category:
             # iab_categories リストの中に指定されたカテゴリが含まれているノードのみを選択
-            node_filter_parts += f".where(values('iab_categories').unfold().is('{iab_category}'))"
+            node_filter_parts += ".where(values('iab_categories').unfold().is(iabCategory))"
 
         # 2. エッジフィルタ部品 (min_score)
         # score プロパティが min_score 以上であること
-        edge_filter_parts = f".has('{self.EDGE_LABEL_RELATED}', 'score', gt({min_score}))"
+        edge_filter_parts = ".has(relLabel, 'score', gt(minScore))"
 
         # ----------------------------------------------------
-        # 3. ノード取得クエリの実行
+        # 3. ノード/エッジ取得クエリ (1 回の BFS で両方を返す)
         # ----------------------------------------------------
 
-        # ノード取得クエリ: (最終修正版 - constant() を使用)
-        nodes_query = (
-            f"g.V().has('{self.NODE_LABEL_KEYWORD}', 'original_name', '{seed_keyword}').as('start')."
-            f"repeat(both('{self.EDGE_LABEL_RELATED}')).times({max_depth}).emit()."
-            f"union(identity(), select('start'))."
-            f"dedup()"
+        # 到達可能な頂点集合を aggregate('vs') に 1 度だけ求め、
+        # ノードはその集合から、エッジは集合内の頂点同士を結ぶものとして導出する
+        return (
+            f"{g_prefix}.V().has(kwLabel, 'original_name', seed).aggregate('vs')."
+            # スコア条件を満たさないエッジは repeat 内で捨て、フロンティアを各ホップで刈り込む
+            # (entity_type / iab_category は中継ノードの探索を妨げないよう、出力側でのみ適用する)
+            "repeat("
+            # Category/Channel など Keyword 以外の頂点を経由してフロンティアが広がらないようラベルで絞る
+            f"bothE(relLabel){edge_filter_parts}.otherV().hasLabel(kwLabel).where(without('vs')).dedup().limit(maxFrontier).aggregate('vs')"
+            ").times(depth)."
+            "cap('vs')."
+            "project('nodes', 'edges')"
+            # a) ノード
+            ".by(unfold().dedup()"
             f"{node_filter_parts}"
-            f".project('id', 'name', 'entity_type', 'iab_categories', 'original_name')"
-            f".by(id())"
-            f".by(coalesce(values('name'), __.constant('')))"
-            f".by(coalesce(values('entity_type'), __.constant('')))"  # __.constant('') を使用
-            f".by(values('iab_categories').fold().coalesce(unfold(), __.constant([])))"  # __.constant([]) を使用
-            f".by(coalesce(values('original_name'), __.constant('')))"
-            f".toList()"
+            # 孤立ノードの除去: 到達集合内の頂点とスコア条件を満たすエッジで結ばれているノードのみ返す
+            # (エッジ側 b) と同じ条件のため、返却されるエッジのいずれかの端点になるノードだけが残る)
+            f".where(bothE(relLabel){edge_filter_parts}.otherV().where(within('vs')))"
+            # project 前にバリアを置き、プロパティ取得をまとめて実行させる
+            ".barrier()"
+            ".project('id', 'name', 'entity_type', 'iab_categories', 'original_name')"
+            ".by(id())"
+            ".by(coalesce(values('name'), __.constant('')))"
+            ".by(coalesce(values('entity_type'), __.constant('')))"  # __.constant('') を使用
+            ".by(values('iab_categories').fold().coalesce(unfold(), __.constant([])))"  # __.constant([]) を使用
+            ".by(coalesce(values('original_name'), __.constant('')))"
+            ".fold())"
+            # b) エッジ (両端が到達集合に含まれ、スコア条件を満たすもの)
+            ".by(unfold().dedup()."
+            f"bothE(relLabel){edge_filter_parts}.where(otherV().where(within('vs'))).dedup()"
+            ".project('id', 'score', 'from_id', 'to_id')"
+            ".by(id())"
+            # Groovy の 0.0 リテラルは BigDecimal になるため、保存値 (Double) と型を揃えて 0.0d とする
+            ".by(coalesce(values('score'), constant(0.0d)))"
+            ".by(__.outV().id())"
+            ".by(__.inV().id())"
+            ".fold())"
         )
 
-        # ----------------------------------------------------
-        # 4. エッジ取得クエリの実行
-        # ----------------------------------------------------
-
-        # エッジ取得クエリ: (安定版をベースにスコアフィルタを追加)
-        edges_query = (
-            f"g.V().has('{self.NODE_LABEL_KEYWORD}', 'original_name', '{seed_keyword}')."
-            f"repeat("
-            f"bothE('{self.EDGE_LABEL_RELATED}'){edge_filter_parts}.otherV()"
-            f").times({max_depth})."
-            f"bothE('{self.EDGE_LABEL_RELATED}'){edge_filter_parts}.dedup()"
-            f".project('id', 'score', 'from_id', 'to_id')"
-            f".by(id())"
-            f".by(coalesce(values('score'), constant(0.0)))"
-            f".by(__.outV().id())"
-            f".by(__.inV().id())"
-            f".toList()"
-        )
-
-        # ----------------------------------------------------
-        # 5. 実行と結果の整形
-        # ----------------------------------------------------
-
-        try:
-            raw_nodes = await self._execute_gremlin(nodes_query)
-            raw_edges = await self._execute_gremlin(edges_query)
-        except Exception as e:
-            logger.error("Failed to fetch graph data from Gremlin (Filtered Query).", error=str(e))
-            return {"nodes": [], "edges": []}
-
-        # 6. 結果の整形（Python側で結合と型変換）
-        nodes = {}
-        edges = []
-
-        for item in raw_nodes:
-
-            iab_categories_raw = item.get('iab_categories')
-
-            # 💡 修正: iab_categories がリストでない (単一の文字列である) 場合はリスト化
-            if iab_categories_raw is None:
-                # Gremlinから何も返されなかった場合（属性なしノード）
-                final_iab_categories = []
-            elif isinstance(iab_categories_raw, str):
-                # 単一の文字列が返された場合（プロパティが一つだけの場合）
-                final_iab_categories = [iab_categories_raw]
-            elif not isinstance(iab_categories_raw, list):
-                # リストでないが None/str でもない予期せぬ型の場合、リストに変換 (安全策)
-                final_iab_categories = [str(iab_categories_raw)]
-            else:
-                # 既にリストである場合
-                final_iab_categories = iab_categories_raw
-
-            node_id = str(item.get('id'))
-            if node_id not in nodes:
-                nodes[node_id] = {
-                    "id": node_id,
-                    "label": item.get('name'),
-                    "group": self.NODE_LABEL_KEYWORD,
-                    "entity_type": item.get('entity_type'),
-                    "iab_categories": final_iab_categories,
-                    "original_name": item.get('original_name', item.get('name', ''))
-                }
-
-        for item in raw_edges:
-            score_value = item.get('score')
-
-            # BigDecimalをfloatに変換
-            if hasattr(score_value, 'unscaled_value') and hasattr(score_value, 'scale'):
-                score_float = float(score_value.unscaled_value) / (10 ** score_value.scale)
-            else:
-                score_float = float(score_value)
-
-            edges.append({
-                "id": str(item.get('id')),
-                "from_node": str(item.get('from_id')),
-                "to_node": str(item.get('to_id')),
-                "score": score_float
-            })
-
-        # ----------------------------------------------------
-        # 7. 【追加】孤立ノードの除去 (Orphan Node Removal)
-        # ----------------------------------------------------
-
-        # a. フィルタリングされたエッジに含まれるノードIDを収集
-        connected_node_ids: Set[str] = set()
-        for edge in edges:
-            # エッジが残っているなら、その両端のノードは接続されている
-            connected_node_ids.add(edge['from_node'])
-            connected_node_ids.add(edge['to_node'])
-
-        # b. 接続されたノードのみをフィルタリングして最終リストを作成
-        final_nodes = []
-        for node_id, node_data in nodes.items():
-            # Edgeのいずれかの端点に含まれるノードのみを採用
-            if node_id in connected_node_ids:
-                final_nodes.append(node_data)
-
-        # 最終的な戻り値として、フィルタリングされたノードとエッジを返す
-        return {"nodes": final_nodes, "edges": edges}  # nodes.values() ではなく final_nodes を使用する
-
-        # -----------------------------------------------------------------
-        # ★ 新規追加機能: 複数キーワード x 共通ノード探索 (AND条件)
-        # -----------------------------------------------------------------
-
-    async def fetch_common_nodes(
+    async def _fetch_related_graph_uncached(
             self,
-            seed_keywords: List[str],
-            min_score: float = 0.0,
-            entity_type: str | None = None,
-            iab_category: str | None = None
+            seed_keyword: str,
+            max_depth: int,
+            min_score: float,
+            entity_type: str | None,
+            iab_category: str | None
     ) -> GraphData:
+        logger.info("Fetching graph data with filters.",
+                    seed_keyword=seed_keyword,
+                    max_depth=max_depth,
+                    min_score=min_score,
+                    entity_type=entity_type,
+                    iab_category=iab_category)
 
-        if not seed_keywords or len(seed_keywords) < 2:
-            logger.warning("Common node search requires at least two keywords.", count=len(seed_keywords))
-            return {"nodes": [], "edges": []}
-
-        logger.info("Fetching graph data (Common Node Search).", seed_keywords=seed_keywords, min_score=min_score)
-
-        # Groovy形式のリストに変換 (例: ['YouTuber', '釣り'] -> '["YouTuber", "釣り"]')
-        keywords_for_groovy = str(seed_keywords).replace("'", '"')
+        # 値はすべて bindings で渡し、フィルタの有無が同じクエリはサーバー側で同一スクリプトとして再利用させる
+        bindings: Dict[str, Any] = {
+            'kwLabel': self.NODE_LABEL_KEYWORD,
+            'relLabel': self.EDGE_LABEL_RELATED,
+            'seed': seed_keyword,
+            'depth': max_depth,
+            'minScore': min_score,
+            'maxFrontier': self.MAX_FRONTIER,
+        }
 
-        # フィルタリング条件の構築 (fetch_related_graph と同様)
-        node_filter_parts = ""
         if entity_type:
-            node_filter_parts += f".has('entity_type', '{entity_type}')"
+            bindings['entityType'] = entity_type
         if iab_category:
-            node_filter_parts += f".where(values('iab_categories').unfold().is('{iab_category}'))"
-
-        edge_filter_parts = f".has('score', gt({min_score}))"
-
-        # ----------------------------------------------------
-        # 共通ノード探索トラバーサルの構築 (AND条件)
-        # ----------------------------------------------------
-
-        first_keyword = seed_keywords[0]
+            bindings['iabCategory'] = iab_category
 
-        # その他のキーワードに対する AND 条件の構築
-        and_traversals = []
-        for kw in seed_keywords[1:]:
-            # __.both().has('original_name', kw) というトラバーサルが成功するかチェック
-            and_traversals.append(
-                f"__.both('{self.EDGE_LABEL_RELATED}').has('original_name', '{kw}')"
-            )
+        # クエリ本文はフィルタの有無の組み合わせ毎に 1 度だけ組み立てたものを再利用する
+        graph_query = self._build_graph_query(self.g_prefix, bool(entity_type), bool(iab_category))
 
-        # AND条件が一つ以上ある場合に and() ステップを構築
-        # where(__.and(...)) の中のトラバーサル部分を定義
-        and_traversal_content = f"__.and({','.join(and_traversals)})"
-        and_filter_part = f".where({and_traversal_content})" if and_traversals else ""
-
-        # ----------------------------------------------------
-        # 3. ノード取得クエリ (共通ノードとシードノードの両方を取得)
         # ----------------------------------------------------
-
-        nodes_query = (
-            # 1. 最初のキーワードを起点とし、関連ノードへ進む (スコアフィルタを適用)
-            f"g.V().has('{self.NODE_LABEL_KEYWORD}', 'original_name', '{first_keyword}')."
-            f"bothE('{self.EDGE_LABEL_RELATED}'){edge_filter_parts}.otherV().as('common_node')"
-
-            # 2. 他の全てのキーワードからも到達可能であることを and() で検証
-            f"{and_filter_part}"  # .where(__.and(...)) が適用される
-
-            # 3. ノードレベルのフィルタを適用
-            f"{node_filter_parts}"
-
-            # 4. 共通ノード、および元のシードノード群を取得し、重複除去
-            # トラバーサルの安定化のため、直前の select() は不要な場合が多いため削除し、union() を直接結合
-            f".union("
-            f"identity(), select('common_node'), "
-            f"__.V().has('{self.NODE_LABEL_KEYWORD}', 'original_name', within({keywords_for_groovy}))"
-            f").dedup()"
-
-            # プロジェクション
-            f".project('id', 'name', 'entity_type', 'iab_categories', 'original_name')"
-            f".by(id())"
-            f".by(coalesce(values('name'), __.constant('')))"
-            f".by(coalesce(values('entity_type'), __.constant('')))"
-            f".by(values('iab_categories').fold().coalesce(unfold(), __.constant([])))"
-            f".by(coalesce(values('original_name'), __.constant('')))"
-            f".toList()"
-        )
-
-        # ----------------------------------------------------
-        # 4. エッジ取得クエリ (シードノードと共通ノード群の間のエッジのみ)
+        # 5. 実行と結果の整形
         # ----------------------------------------------------
 
-        edges_query = (
-            f"g.V().has('{self.NODE_LABEL_KEYWORD}', 'original_name', within({keywords_for_groovy})).as('a')."
-            f"bothE('{self.EDGE_LABEL_RELATED}').as('e')."
-
-            # 💡 修正: 共通ノード（common_node）へのエッジであるかをチェックするロジックを、
-            #         代わりにノードクエリの結果（raw_nodes）に含まれるノードへ接続しているかで判断すべき
-            #         しかし、Gremlin単体でやるため、ここではノードクエリで取得したノードリスト（V）に接続しているかを見る
-            #         まずはシンプルなエッジ取得クエリに戻す。
-            f"where(__.otherV().hasLabel('{self.NODE_LABEL_KEYWORD}'))"  # 相手がKeywordであることを確認
-            f".select('e')"
-            f"{edge_filter_parts}.dedup()"  # min_scoreフィルタと重複除去
-
-            f".project('id', 'score', 'from_id', 'to_id')"
-            f".by(id())"
-            f".by(coalesce(values('score'), constant(0.0)))"
-            f".by(__.outV().id())"
-            f".by(__.inV().id())"
-            f".toList()"
-        )
+        results = await self._execute_gremlin(graph_query, bindings)
 
-        # ----------------------------------------------------
-        # 5. 実行と結果の整形 (ステップ 5, 6, 7 はそのまま)
-        # ----------------------------------------------------
-
-        try:
-            raw_nodes = await self._execute_gremlin(nodes_query)
-            raw_edges = await self._execute_gremlin(edges_query)
-        except Exception as e:
-            logger.error("Failed to fetch graph data from Gremlin (Common Node Query).", error=str(e))
+        if not results:
             return {"nodes": [], "edges": []}
-
-        # 6. 結果の整形（Python側で結合と型変換）
-        nodes = {}
-        edges = []
-
-        for item in raw_nodes:
-            iab_categories_raw = item.get('iab_categories')
-            if iab_categories_raw is None:
-                final_iab_categories = []
-            elif isinstance(iab_categories_raw, str):
-                final_iab_categories = [iab_categories_raw]
-            elif not isinstance(iab_categories_raw, list):
-                final_iab_categories = [str(iab_categories_raw)]
-            else:
-                final_iab_categories = iab_categories_raw
-
-            node_id = str(item.get('id'))
-            if node_id not in nodes:
-                nodes[node_id] = {
-                    "id": node_id,
-                    "label": item.get('name'),
-                    "group": self.NODE_LABEL_KEYWORD,
-                    "entity_type": item.get('entity_type'),
-                    "iab_categories": final_iab_categories,
-                    "original_name": item.get('original_name', item.get('name', ''))
-                }
-
-        for item in raw_edges:
-            score_value = item.get('score')
-
-            if hasattr(score_value, 'unscaled_value') and hasattr(score_value, 'scale'):
-                score_float = float(score_value.unscaled_value) / (10 ** score_value.scale)
-            else:
-                score_float = float(score_value)
-
-            edges.append({
-                "id": str(item.get('id')),
-                "from_node": str(item.get('from_id')),
-                "to_node": str(item.get('to_id')),
-                "score": score_float
-            })
-
-        # 7. 孤立ノードの除去
-        connected_node_ids: Set[str] = set()
-        for edge in edges:
-            connected_node_ids.add(edge['from_node'])
-            connected_node_ids.add(edge['to_node'])
-
-        final_nodes = []
-        for node_id, node_data in nodes.items():
-            if node_id in connected_node_ids:
-                final_nodes.append(node_data)
-
-        return {"nodes": final_nodes, "edges": edges}
-
-    async def get_new_and_eligible_keywords(self,
-                                            seed_keyword: str,
-                                            min_score: float,
-                                            entity_type: str,
-                                            max_depth: int = 1) -> List[str]:
+        raw_nodes = results[0]['nodes']
+        raw_edges = results[0]['edges']
+
+        # 6. 結果の整形（Python側で型変換）
+        # 重複除去はトラバーサル側の dedup() で済んでいるため、そのままリスト化する
+        nodes = _format_nodes(raw_nodes, self.NODE_LABEL_KEYWORD)
+        edges = _format_edges(raw_edges)
+
+        # 孤立ノード (条件を満たすエッジを持たないノード) はトラバーサル側で除外済み
+        return {"nodes": nodes, "edges": edges}
+
+    # 新規キーワード探索クエリ (起点ノードは within() でまとめて検索する)
+    # (1) 起点キーワードV1から関連エッジを辿り、ノードV2に到達
+    # (2) V2が指定された entity_type を持つことを確認
+    # (3) V1->V2のエッジが min_score 以上であることを確認
+    # (4) V2を起点として「まだRELATED_TOエッジが出されていない」ことを確認 (新規性チェック)
+    # 結果は (シード名, 新規キーワード名) の組の列で返し、group() で全件を 1 つの Map に集約させずに
+    # サーバーがページ単位で順次返せるようにする
+    _NEW_ELIGIBLE_KEYWORDS_MANY = (
+        "g.V().has(kwLabel, 'name', within(seeds)).as('seed')."
+        "outE(relLabel).has('score', gt(minScore)).inV()."
+        "has('entity_type', entityType)."
+        "where(outE(relLabel).count().is(0))."  # 💡 新規性チェック: ターゲットノードから外向きのエッジがないこと（つまり、まだ起点として使われていない）
+        "as('keyword').select('seed', 'keyword').by('name')"
+    )
+
+    async def get_new_and_eligible_keywords_many(self,
+                                                 seed_keywords: List[str],
+                                                 min_score: float,
+                                                 entity_type: str) -> Dict[str, List[str]]:
         """
         指定された条件に合致し、かつ、まだ起点キーワードとして登録されていない
-        新しい（New）の関連キーワードをGraphDBから発見します。
+        新しい（New）の関連キーワードを、複数のシードについて 1 回の round-trip でGraphDBから発見します。
 
-        この処理はブロッキングなので、asyncio.to_thread で呼び出されます。
-
-        :return: 条件を満たす新規キーワードのリスト
+        :return: シードキーワード -> 条件を満たす新規キーワードのリスト (該当なしのシードは空リスト)
         """
-
-        # 1. フィルタリング条件の定義
-        # - entity_typeが指定値であること
-        # - scoreがmin_score以上であること
-
-        # 2. Gremlin クエリの構築
-        # (1) 起点キーワードV1から関連エッジを辿り、ノードV2に到達
-        # (2) V2が指定された entity_type を持つことを確認
-        # (3) V1->V2のエッジが min_score 以上であることを確認
-        # (4) V2を起点として「まだRELATED_TOエッジが出されていない」ことを確認 (新規性チェック)
-
-        query = (
-            f"g.V().has('{self.NODE_LABEL_KEYWORD}', 'name', '{seed_keyword}')."
-            f"outE('{self.EDGE_LABEL_RELATED}').has('score', gt({min_score})).inV().as('target')."
-            f"has('entity_type', '{entity_type}')."
-            f"where(outE('{self.EDGE_LABEL_RELATED}').count().is(0))."  # 💡 新規性チェック: ターゲットノードから外向きのエッジがないこと（つまり、まだ起点として使われていない）
-            f"values('name').toList()"
-        )
+        found: Dict[str, List[str]] = {seed: [] for seed in seed_keywords}
+        if not found:
+            return found
+
+        # ユーザー入力由来の値 (キーワード等) はすべて bindings で渡す
+        bindings = {
+            'kwLabel': self.NODE_LABEL_KEYWORD,
+            'relLabel': self.EDGE_LABEL_RELATED,
+            'seeds': list(found),
+            'minScore': min_score,
+            'entityType': entity_type,
+        }
 
         try:
-            results = await asyncio.to_thread(self._sync_execute_gremlin, query)
-            # results はキーワード名 (str) のリスト
-            return [str(name) for name in results]
-
+            # 受信したページから順に、シード毎のリストへ振り分ける
+            async for row in self._stream_gremlin(self._NEW_ELIGIBLE_KEYWORDS_MANY, bindings):
+                found[str(row['seed'])].append(str(row['keyword']))
         except Exception as e:
-            logger.error("Failed to fetch new eligible keywords from Gremlin.", error=str(e))
-            return []
+            logger.error("Failed to fetch new eligible keywords from Gremlin.", seed_keywords=seed_keywords,
+                         error=str(e))
+            # 途中まで受信した結果は使わず、全シードを該当なしとして返す
+            return {seed: [] for seed in found}
+
+        return found
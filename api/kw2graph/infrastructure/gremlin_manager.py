@@ -25,12 +25,30 @@ class GremlinClientManager:
             return
 
         self._url = f'ws://{settings.graphdb_host}:{settings.graphdb_port}/gremlin'
-        logger.info("Initializing Gremlin Client.", url=self._url)
+        logger.info("Initializing Gremlin Client.", url=self._url,
+                    pool_size=settings.gremlin_pool_size, max_workers=settings.gremlin_max_workers)
 
+        # 送信は max_workers のスレッドがプールから接続を借りて行い、空き接続がなければその場で待たされる。
+        # プールが小さすぎると asyncio 側で並行に投げても送信が直列化されるため、
+        # 想定する同時クエリ数 (fetch の gather や graphdb_write_concurrency) 以上に設定する
+        if settings.gremlin_max_workers < settings.gremlin_pool_size:
+            logger.warning("gremlin_max_workers is smaller than gremlin_pool_size; extra connections stay idle.",
+                           pool_size=settings.gremlin_pool_size, max_workers=settings.gremlin_max_workers)
+        if settings.gremlin_pool_size < settings.graphdb_write_concurrency:
+            logger.warning("gremlin_pool_size is smaller than graphdb_write_concurrency; write batches will queue.",
+                           pool_size=settings.gremlin_pool_size,
+                           write_concurrency=settings.graphdb_write_concurrency)
+
+        # プロセス全体で 1 つの Client (= 1 つのコネクションプール) を共有し、リクエスト毎のハンドシェイクを避ける
         self._client = gremlin_client.Client(
             self._url,
             'g',
-            message_serializer=serializer.GraphSONSerializersV3d0()
+            pool_size=settings.gremlin_pool_size,
+            max_workers=settings.gremlin_max_workers,
+            # WebSocket の permessage-deflate を有効にし、グラフ取得結果の転送量を削減する
+            enable_compression=True,
+            # GraphSON (JSON) より小さく、エンコード/デコードも軽い GraphBinary を使う (サーバー 3.4 以降が対応)
+            message_serializer=serializer.GraphBinarySerializersV1()
         )
         # Note: 接続テストは初回クエリ実行時に任せ、__init__ では行わない。
 
@@ -1,246 +1,49 @@
 import asyncio
-from json import JSONDecodeError
-from typing import List, Dict, Any, Awaitable
+import hashlib
+import re
+import unicodedata
+from typing import List, Dict, Any, AsyncIterator, Awaitable, NotRequired, Tuple, TypedDict
 
-import json
+import orjson
 import structlog
-from openai import OpenAI, OpenAIError
+from openai import AsyncOpenAI, OpenAI, OpenAIError
+from pydantic import TypeAdapter, ValidationError
 
 from kw2graph import config
 from kw2graph.infrastructure.base import RepositoryBase
+from kw2graph.infrastructure.openai_manager import GLOBAL_OPENAI_MANAGER
+from kw2graph.util.cache import TtlLruCache
+from kw2graph.util.rate_limit import AsyncRateLimiter
 
 logger = structlog.get_logger(__name__)
 
 OpenAiExtractionResult = List[Dict[str, Any]]
 
 
-class OpenAiRepository(RepositoryBase):
-    MODEL = "gpt-5-nano"
-    BATCH_SIZE = 100
+class RelatedKeyword(TypedDict):
+    """OpenAI が返す関連キーワード 1 件の形式 (任意項目は登録時に既定値で補完される)"""
+    keyword: str
+    score: float
+    original_name: NotRequired[str]
+    entity_type: NotRequired[str]
+    iab_categories: NotRequired[List[str]]
 
-    IAB_CATEGORIES = [
-        "Arts & Entertainment", "Automotive", "Business", "Careers", "Education",
-        "Family & Relationships", "Food & Drink", "Health & Fitness", "Hobbies & Interests",
-        "Home & Garden", "Law, Govt & Politics", "News", "Personal Finance", "Pets",
-        "Science", "Shopping", "Sports", "Style & Fashion", "Technology & Computing",
-        "Travel", "Video Gaming", "Other"
-    ]
 
-    def __init__(self, settings: config.Settings):
-        super().__init__(settings)
-        self.client = OpenAI(api_key=settings.openai_api_key)
+class _ExtractionResponse(TypedDict):
+    related_keywords: List[RelatedKeyword]
 
-    @staticmethod
-    def _generate_prompt_old(seed_keyword: str, titles: List[str]) -> str:
-        titles_str = "\n".join([f"{i + 1}. {title}" for i, title in enumerate(titles)])
-
-        prompt = f"""
-    あなたはキーワード抽出とスコアリングの専門家です。
-    以下の手順で、提供されたコンテンツタイトル群からシードキーワードに関連性の高い語句を抽出し、関連度をスコア化してください。
-
-    #シードキーワード: {seed_keyword}
-
-    #コンテンツタイトル群:
-    {titles_str}
-
-    #手順
-    1. タイトルからシードキーワード「{seed_keyword}」に**直接関連する単語やフレーズ**を抽出する。
-    2. 抽出された各語句に対し、シードキーワード「{seed_keyword}」との**関連度を0.0から1.0の間でスコア**（float型）として付与する。
-    3. 結果をJSON形式のオブジェクトとして出力する。**出力は必ずJSON形式のみ**とし、他の説明や前置きは含めないでください。
-
-    #JSON出力形式:
-    {{
-      "related_keywords": [
-        {{"keyword": "抽出された語句", "score": 関連度スコア}},
-        {{"keyword": "別の語句", "score": 関連度スコア}},
-        ...
-      ]
-    }}
-    """
-        logger.debug(f"Generating prompt: \n{prompt}")
-        return prompt
-
-    @staticmethod
-    def _generate_prompt_old2(seed_keyword: str, titles: List[str]) -> str:
-        titles_str = "\n".join([f"{i + 1}. {title}" for i, title in enumerate(titles)])
 
-        prompt = f"""
-        あなたはキーワード抽出とスコアリングの専門家です。
-        以下の手順で、提供されたコンテンツタイトル群から**シードキーワードを修飾する最も具体的かつ独立した語句**を抽出してください。
+# JSON のパースとスキーマ検証を pydantic-core (Rust 実装) で 1 パスで行う。結果は dict のまま後段に渡す
+_EXTRACTION_RESPONSE_ADAPTER = TypeAdapter(_ExtractionResponse)
 
-        #シードキーワード: {seed_keyword}
 
-        #コンテンツタイトル群:
-        {titles_str}
-
-        #手順
-        1. 抽出対象は、シードキーワード「{seed_keyword}」から**独立して意味を持つ、単一の要素**（カスタム名、部品名、行為など）とする。
-        2. 抽出語句は、**シードキーワード（例: ランクル70）を繰り返して含めない**こと。（例: "新型ランクル70 カスタム" ではなく、**"カスタム"** を抽出すること）
-        3. 抽出された各語句に対し、シードキーワードとの**関連度を0.0から1.0の間でスコア**（float型）として付与する。
-        4. 結果をJSON形式のオブジェクトとして出力する。**出力は必ずJSON形式のみ**とし、他の説明や前置きは含めないでください。
-
-        #出力例 (シードキーワードが「ランクル70」の場合の期待値):
-        {{
-          "related_keywords": [
-            {{"keyword": "カスタム", "score": 0.98}},
-            {{"keyword": "アイアンバンパー", "score": 0.90}},
-            {{"keyword": "再販", "score": 0.95}},
-            {{"keyword": "納車", "score": 0.85}},
-            ...
-          ]
-        }}
-
-        """
-        logger.debug(f"Generating prompt: \n{prompt}")
-        return prompt
-
-    @staticmethod
-    def _generate_prompt_old3(seed_keyword: str, titles: List[str]) -> str:
-        titles_str = "\n".join([f"{i + 1}. {title}" for i, title in enumerate(titles)])
-
-        prompt = f"""
-        あなたはキーワード抽出とスコアリングの専門家です。
-        提供されたコンテンツタイトル群から、**シードキーワードが属する上位概念**および**具体的な関連詳細語句**の両方を抽出し、関連度をスコア化してください。
-
-        #シードキーワード: {seed_keyword}
-
-        #コンテンツタイトル群:
-        {titles_str}
-
-        #手順
-        1. 抽出対象は、以下の2種類とする。
-           - **上位概念/主題**: シードキーワードが属する**最も重要なカテゴリ**（例: 「ちいかわ」「アニメ」「キャラクター」）。これらのスコアは高く設定すること。
-           - **具体的な詳細**: シードキーワードを**修飾する**最も具体的かつ独立した語句（例: 「アイアンバンパー」「カップラーメン」「描き方」）。抽出語句は、**シードキーワード（例: くりまんじゅう）を繰り返して含めない**こと。
-        2. 抽出された各語句に対し、シードキーワード「{seed_keyword}」との**関連度を0.0から1.0の間でスコア**（float型）として付与する。
-        3. 結果をJSON形式のオブジェクトとして出力する。**出力は必ずJSON形式のみ**とし、他の説明や前置きは含めないでください。
-
-        #出力例 (シードキーワードが「くりまんじゅう」の場合の期待値):
-        {{
-          "related_keywords": [
-            {{"keyword": "ちいかわ", "score": 0.99}},          // 上位概念
-            {{"keyword": "アニメ", "score": 0.96}},            // 上位概念
-            {{"keyword": "栗まんじゅう編", "score": 0.92}},      // 詳細（エピソード名）
-            {{"keyword": "カップラーメン", "score": 0.85}},      // 詳細（商品名/モノ）
-            {{"keyword": "描き方", "score": 0.82}},             // 詳細（行為）
-            ...
-          ]
-        }}
-        """
-        logger.debug(f"Generating prompt: \n{prompt}")
-        return prompt
-
-    def _generate_prompt_old4(self, seed_keyword: str, titles: List[str]) -> str:
-        titles_str = "\n".join([f"{i + 1}. {title}" for i, title in enumerate(titles)])
-
-        # 広告業界標準の IAB Tier 1 カテゴリリスト
-        iab_list_str = ", ".join(self.IAB_CATEGORIES)
-
-        prompt = f"""
-        あなたはキーワード抽出、階層分析、および標準化された分類を専門とするエキスパートAIです。
-        提供されたコンテンツタイトル群を分析し、シードキーワード「{seed_keyword}」に関する以下の3つの属性を持つ語句を抽出し、JSON形式でリスト化してください。
-
-        #シードキーワード: {seed_keyword}
-
-        #コンテンツタイトル群:
-        {titles_str}
-
-        #手順
-        1. **上位概念の特定**: タイトル群全体から、「{seed_keyword}」が属する**最も重要なカテゴリ名や主題**を抽出する。これらの語句には最も高いスコアを付与すること。
-        2. **詳細語句の分解**: タイトルから、シードキーワードを修飾する**具体的かつ独立した語句**（部品名、エピソード名、行為など）を抽出する。抽出語句は、シードキーワード自体（例: くりまんじゅう）を**含めない**ように徹底して分解すること。
-        3. **entity_type の判断**: 抽出された各語句が、**特定の固有名詞（人名、作品名、商品名など）であれば 'Proper'** を、**一般的な名詞や概念であれば 'General'** を判断し付与する。
-        4. **IAB分類へのマッピング**: 抽出された各語句に対し、その語句の意味を最も適切に表す**IAB Tier 1 カテゴリを**、以下のリストから**最大3つまで選択**し、'iab_categories' として**文字列の配列（リスト）**で付与すること。
-
-        【IAB Tier 1 カテゴリ リスト】: {iab_list_str}
-
-        #JSON出力形式:
-        {{
-          "related_keywords": [
-            {{
-              "keyword": "抽出された語句", 
-              "score": 関連度スコア, 
-              "iab_categories": ["カテゴリ1", "カテゴリ2"], // ★ 修正: リスト型
-              "entity_type": "Proper/General"        
-            }},
-            {{
-              "keyword": "別の語句", 
-              "score": 別の関連度スコア,
-              "iab_categories": ["別のカテゴリ名"],
-              "entity_type": "Proper/General"
-            }},
-            ...
-          ]
-        }}
-
-        #出力例 (シードキーワードが「くりまんじゅう」の場合の期待値):
-        {{
-          "related_keywords": [
-            {{"keyword": "ちいかわ", "score": 0.99, "iab_categories": ["Arts & Entertainment", "Family & Relationships"], "entity_type": "Proper"}},
-            {{"keyword": "カップラーメン", "score": 0.85, "iab_categories": ["Food & Drink"], "entity_type": "Proper"}},
-            ...
-          ]
-        }}
-        """
-        logger.debug(f"Generating prompt: \n{prompt}")
-        return prompt
-
-    def _generate_prompt_old5(self, seed_keyword: str, titles: List[str]) -> str:
-        titles_str = "\n".join([f"{i + 1}. {title}" for i, title in enumerate(titles)])
-
-        # IAB カテゴリリストはそのまま維持（必須情報）
-        iab_list_str = ", ".join(self.IAB_CATEGORIES)
-
-        prompt = f"""
-        コンテンツタイトル群を分析し、シードキーワード「{seed_keyword}」に関する以下の属性を持つ語句を抽出し、JSON形式でリスト化してください。
-
-        #シードキーワード: {seed_keyword}
-
-        #コンテンツタイトル群:
-        {titles_str}
-
-        #抽出と分類のルール
-        * **語句 (keyword)**: 
-            1. タイトル群の**上位概念/主題**（例: ちいかわ、アニメ）を抽出する。
-            2. シードキーワードを**修飾する具体的かつ独立した語句**（例: 部品名、エピソード名）を、シードキーワードを含めずに**徹底して分解**し抽出する。
-        * **関連度 (score)**: 0.0〜1.0 の間で付与する。上位概念には最も高いスコアを付与する。
-        * **エンティティ種別 (entity_type)**: 固有名詞（作品名、商品名など）は 'Proper'、一般的名詞/概念は 'General' とする。
-        * **IABカテゴリ (iab_categories)**: 以下の【IAB Tier 1 カテゴリ リスト】から、**最大3つ**をリストとして選択する。
-
-        【IAB Tier 1 カテゴリ リスト】: {iab_list_str}
-
-        #JSON出力形式:
-        {{
-          "related_keywords": [
-            {{
-              "keyword": "抽出された語句", 
-              "score": 関連度スコア, 
-              "iab_categories": ["カテゴリ1", "カテゴリ2"],
-              "entity_type": "Proper/General"        
-            }},
-            {{
-              "keyword": "別の語句", 
-              "score": 別の関連度スコア,
-              "iab_categories": ["別のカテゴリ名"],
-              "entity_type": "Proper/General"
-            }},
-            ...
-          ]
-        }}
-        """
-        logger.debug(f"Generating prompt: \n{prompt}")
-        return prompt
-
-    def _generate_prompt(self, seed_keyword: str, titles: List[str]) -> str:
-        titles_str = "\n".join([f"{i + 1}. {title}" for i, title in enumerate(titles)])
-
-        # IAB カテゴリリストはそのまま維持（必須情報）
-        iab_list_str = ", ".join(self.IAB_CATEGORIES)
-
-        prompt = f"""
-        コンテンツタイトル群を分析し、シードキーワード「{seed_keyword}」に関する以下の属性を持つ語句を抽出し、JSON形式でリスト化してください。
-        #シードキーワード: {seed_keyword}
-
-        #コンテンツタイトル群:
-        {titles_str}
+# 抽出時の system プロンプト。指示・ルール・IAB カテゴリ・出力形式などの固定部分をすべてここに置き、
+# 可変部分 (シードキーワード / タイトル群) は user メッセージとして末尾に渡す。
+# 先頭が全リクエストで一致するため、OpenAI の自動プロンプトキャッシュ (プレフィックス一致) が効く
+# (IAB カテゴリのみクラス定義時に埋め込む。リテラルの波括弧は {{ }} でエスケープしている)
+_SYSTEM_PROMPT_TEMPLATE = """
+        あなたは与えられたテキストから関連キーワードを抽出し、指定されたJSON形式のオブジェクトで出力するエキスパートです。
+        ユーザーから与えられるコンテンツタイトル群を分析し、シードキーワードに関する以下の属性を持つ語句を抽出し、JSON形式でリスト化してください。
 
         #事前ステップ
         1. **主題の特定**: 提供されたタイトル群から、この解析の**最も主要な主題、作品名、またはブランド名**を特定する。この主題名を「固定文脈」として以下のルールに適用する。
@@ -281,47 +84,253 @@ class OpenAiRepository(RepositoryBase):
           ]
         }}
         """
-        return prompt
+
+
+# タイトル正規化時に 1 つの空白へ圧縮する空白文字の連続
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class OpenAiRepository(RepositoryBase):
+    MODEL = "gpt-5-nano"
+    BATCH_SIZE = 100
+    # 1 バッチのタイトル群に割り当てるトークン数の目安。短いタイトルは BATCH_SIZE 件まで、
+    # 長いタイトルはこの上限に収まる件数までを 1 リクエストにまとめる
+    BATCH_MAX_TITLE_TOKENS = 4000
+
+    # (seed_keyword, タイトル群のハッシュ) -> 抽出結果。同一入力での再呼び出しを省くため、クラス属性としてプロセス全体で共有する
+    # (タイトルの並び順が違うだけの入力も同じ結果を共有する)
+    RESULT_CACHE_SIZE = 1024
+    RESULT_CACHE_TTL_SECONDS = 600
+    _result_cache: TtlLruCache[tuple[str, str], OpenAiExtractionResult] = TtlLruCache(
+        maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL_SECONDS)
+    # 実行中のバッチ抽出 (キャッシュキー -> Future)。並行する同一バッチを 1 回の呼び出しにまとめる
+    _result_inflight: Dict[tuple[str, str], asyncio.Future] = {}
+
+    IAB_CATEGORIES = [
+        "Arts & Entertainment", "Automotive", "Business", "Careers", "Education",
+        "Family & Relationships", "Food & Drink", "Health & Fitness", "Hobbies & Interests",
+        "Home & Garden", "Law, Govt & Politics", "News", "Personal Finance", "Pets",
+        "Science", "Shopping", "Sports", "Style & Fashion", "Technology & Computing",
+        "Travel", "Video Gaming", "Other"
+    ]
+    # プロンプトに埋め込む IAB カテゴリ一覧 (固定値のため 1 度だけ連結する)
+    IAB_CATEGORIES_STR = ", ".join(IAB_CATEGORIES)
+    # Structured Outputs (strict) の JSON Schema。応答の形式を OpenAI 側で保証させ、
+    # related_keywords の欠落や型違いで 1 回分の呼び出しが無駄になることを防ぐ (strict では全項目が必須)
+    _RELATED_KEYWORDS_SCHEMA = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {
+                "keyword": {"type": "string"},
+                "original_name": {"type": "string"},
+                "score": {"type": "number"},
+                "iab_categories": {"type": "array", "items": {"type": "string", "enum": IAB_CATEGORIES}},
+                "entity_type": {"type": "string", "enum": ["Proper", "General"]},
+            },
+            "required": ["keyword", "original_name", "score", "iab_categories", "entity_type"],
+            "additionalProperties": False,
+        },
+    }
+    RESPONSE_FORMAT = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "related_keywords",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {"related_keywords": _RELATED_KEYWORDS_SCHEMA},
+                "required": ["related_keywords"],
+                "additionalProperties": False,
+            },
+        },
+    }
+    # system プロンプトは固定値のため、クラス定義時に 1 度だけ組み立てる
+    SYSTEM_PROMPT = _SYSTEM_PROMPT_TEMPLATE.format(iab_list_str=IAB_CATEGORIES_STR)
+
+    # 非同期呼び出しの同時実行数・RPM の制御。リポジトリはサービス毎に生成されるため、プロセス全体で共有する
+    _semaphore: asyncio.Semaphore | None = None
+    _rate_limiter: AsyncRateLimiter | None = None
+
+    def __init__(self, settings: config.Settings):
+        super().__init__(settings)
+        # クライアントはプロセス全体で共有し、リクエスト毎にコネクションプール (TLS 接続) を作り直さない
+        self.client: OpenAI = GLOBAL_OPENAI_MANAGER.get_client()
+        # 非同期版 (aextract_related_keywords / Batch API) で利用するクライアント
+        self.aclient: AsyncOpenAI = GLOBAL_OPENAI_MANAGER.get_async_client()
+
+    def _limits(self) -> Tuple[asyncio.Semaphore, AsyncRateLimiter]:
+        """共有の Semaphore / RateLimiter を初回利用時に生成して返します。"""
+        cls = type(self)
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(self.settings.openai_max_concurrency)
+            cls._rate_limiter = AsyncRateLimiter(self.settings.openai_requests_per_minute)
+        return cls._semaphore, cls._rate_limiter
+
+    @staticmethod
+    def _generate_prompt(seed_keyword: str, titles: List[str]) -> str:
+        """user メッセージ (可変部分) を組み立てます。固定の指示は SYSTEM_PROMPT 側に置きます。"""
+        # 中間リストを作らず、ジェネレータから 1 回の join で番号付きタイトル一覧を組み立てる
+        titles_str = "\n".join(f"{i}. {title}" for i, title in enumerate(titles, 1))
+        return f"#シードキーワード: {seed_keyword}\n\n#コンテンツタイトル群:\n{titles_str}"
+
+    @staticmethod
+    def _build_messages(system_prompt: str, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    @staticmethod
+    def _log_usage(response: Any, **log_kwargs) -> None:
+        """プロンプトキャッシュのヒット状況を確認できるよう、トークン使用量を記録します。"""
+        usage = response.usage
+        if usage is None:
+            return
+        details = usage.prompt_tokens_details
+        logger.info("OpenAI token usage.", prompt_tokens=usage.prompt_tokens,
+                    cached_tokens=details.cached_tokens if details else 0,
+                    completion_tokens=usage.completion_tokens, **log_kwargs)
+
+    @staticmethod
+    def _dedupe_titles(titles: List[str]) -> List[str]:
+        """
+        タイトルを正規化 (NFKC / 前後空白の除去 / 連続空白の圧縮) し、出現順を保ったまま重複を除きます。
+        重複判定のみ大文字小文字を区別せず、プロンプトには最初に出現した表記を使います。
+        """
+        deduped: Dict[str, str] = {}
+        for title in titles:
+            if not title:
+                continue
+            normalized = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", title)).strip()
+            if normalized:
+                deduped.setdefault(normalized.casefold(), normalized)
+        return list(deduped.values())
+
+    @staticmethod
+    def _cache_key(seed_keyword: str, titles: List[str]) -> tuple[str, str]:
+        """抽出結果キャッシュのキー。タイトル群は並び順に依存しない固定長のハッシュにまとめます。"""
+        digest = hashlib.blake2b("\n".join(sorted(titles)).encode(), digest_size=16).hexdigest()
+        return seed_keyword, digest
+
+    @staticmethod
+    def _message_content(response: Any, **log_kwargs) -> str | None:
+        """応答本文を返します。Structured Outputs でモデルが応答を拒否した場合は None を返します。"""
+        message = response.choices[0].message
+        if message.refusal:
+            logger.warning("OpenAI refused to generate a response.", refusal=message.refusal, **log_kwargs)
+        return message.content
+
+    @staticmethod
+    def _parse_related_keywords(json_string: str) -> OpenAiExtractionResult:
+        """
+        応答本文 (JSON) を検証し、related_keywords を取り出します。
+        JSON として不正な場合や、related_keywords が期待する形式でない場合は ValidationError を送出します。
+        """
+        data = _EXTRACTION_RESPONSE_ADAPTER.validate_json(json_string)
+        logger.debug("Parsed OpenAI response.", data=data)
+        return data['related_keywords']
 
     def extract_related_keywords(self, seed_keyword: str, titles: List[str]) -> OpenAiExtractionResult:
+        cache_key = self._cache_key(seed_keyword, titles)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Related keywords served from cache.", seed_keyword=seed_keyword)
+            return cached
+
         prompt = self._generate_prompt(seed_keyword, titles)
-        logger.debug(f"Generating prompt: \n{prompt}")
+        json_string = None
 
         try:
-            logger.info(f"Extracting related keywords: {seed_keyword}")
+            logger.info("Extracting related keywords.", seed_keyword=seed_keyword)
             response = self.client.chat.completions.create(
                 model=self.MODEL,
-                messages=[
-                    {"role": "system",
-                     # システムプロンプトもJSON出力を強調
-                     "content": "あなたは与えられたテキストから関連キーワードを抽出し、指定されたJSON形式のオブジェクトで出力するエキスパートです。"},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
+                messages=self._build_messages(self.SYSTEM_PROMPT, prompt),
+                response_format=self.RESPONSE_FORMAT,
             )
 
-            logger.debug(f'Generated response: {response}')
+            logger.debug("Generated response.", response=response)
+            self._log_usage(response, seed_keyword=seed_keyword)
+
+            json_string = self._message_content(response, seed_keyword=seed_keyword)
+            result = self._parse_related_keywords(json_string)
+            # 空の結果 (応答不正を含む) はキャッシュせず、次回の呼び出しで再試行させる
+            if result:
+                self._result_cache.set(cache_key, result)
+            return result
+
+        except ValidationError as e:
+            # 応答が期待通りでない場合、空のリストを返す
+            logger.error("Failed to decode OpenAI response.", errors=e.errors(), raw_content=json_string)
+            return []
+        except OpenAIError as e:
+            logger.error("OpenAI API call failed.", seed_keyword=seed_keyword, error=str(e))
+            return []
+        except Exception:
+            # 想定外の例外もスタックトレース付きでログに残し、呼び出し元には空の結果を返す
+            logger.exception("Unexpected error during OpenAI extraction.", seed_keyword=seed_keyword)
+            return []
 
-            json_string = response.choices[0].message.content
+    async def _acomplete(self, system_prompt: str, prompt: str, response_format: Dict[str, Any],
+                         **log_kwargs) -> str | None:
+        """同時実行数と RPM の制限下で AsyncOpenAI を呼び出し、応答本文 (JSON 文字列) を返します。"""
+        # 同時実行数と RPM を制限し、429 による再試行の連鎖を避ける
+        semaphore, rate_limiter = self._limits()
+        async with semaphore:
+            await rate_limiter.acquire()
+            logger.info("Extracting related keywords.", **log_kwargs)
+            response = await self.aclient.chat.completions.create(
+                model=self.MODEL,
+                messages=self._build_messages(system_prompt, prompt),
+                response_format=response_format,
+            )
 
-            # 💡 ルートがオブジェクトであることを想定してパース
-            data = json.loads(json_string)
-            logger.debug(f"Parsed OpenAI response: {data}")
+        logger.debug("Generated response.", response=response)
+        self._log_usage(response, **log_kwargs)
+        return self._message_content(response, **log_kwargs)
 
-            # 💡 期待されるキー 'related_keywords' が存在するかチェック
-            if isinstance(data, dict) and 'related_keywords' in data:
-                return data['related_keywords']
-            else:
-                logger.error("OpenAI response did not contain 'related_keywords' list.", data=data)
-                # 応答が期待通りでない場合、空のリストを返す
-                return []
+    async def aextract_related_keywords(self, seed_keyword: str, titles: List[str]) -> OpenAiExtractionResult:
+        """
+        extract_related_keywords の非同期版。AsyncOpenAI を直接 await するため、スレッドを消費しません。
+        """
+        cache_key = self._cache_key(seed_keyword, titles)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Related keywords served from cache.", seed_keyword=seed_keyword)
+            return cached
 
-        except JSONDecodeError:
-            logger.error("Failed to decode JSON from OpenAI response.", raw_content=json_string)
+        try:
+            return await self._aextract_related_keywords(seed_keyword, titles)
+        except ValidationError:
+            # 応答が期待通りでない場合、空のリストを返す (ログは _aextract_related_keywords で出力済み)
             return []
-        except Exception as e:
-            print(f"OpenAI API呼び出しエラー: {e}")
+        except OpenAIError as e:
+            logger.error("OpenAI API call failed.", seed_keyword=seed_keyword, error=str(e))
             return []
+        except Exception:
+            # 想定外の例外もスタックトレース付きでログに残し、呼び出し元には空の結果を返す
+            logger.exception("Unexpected error during OpenAI extraction.", seed_keyword=seed_keyword)
+            return []
+
+    async def _aextract_related_keywords(self, seed_keyword: str, titles: List[str]) -> OpenAiExtractionResult:
+        """
+        aextract_related_keywords の本体 (キャッシュ確認なし)。失敗時は空リストにせず、例外をそのまま送出します。
+        """
+        prompt = self._generate_prompt(seed_keyword, titles)
+        json_string = None
+
+        try:
+            json_string = await self._acomplete(self.SYSTEM_PROMPT, prompt, self.RESPONSE_FORMAT,
+                                                 seed_keyword=seed_keyword)
+            result = self._parse_related_keywords(json_string)
+        except ValidationError as e:
+            logger.error("Failed to decode OpenAI response.", errors=e.errors(), raw_content=json_string)
+            raise
+
+        # 空の結果 (応答不正を含む) はキャッシュせず、次回の呼び出しで再試行させる
+        if result:
+            self._result_cache.set(self._cache_key(seed_keyword, titles), result)
+        return result
 
     # -----------------------------------------------------------
     # 2. 新規関数: 非同期バッチ処理 (Parallel/Non-Blocking) を追加
@@ -329,23 +338,224 @@ class OpenAiRepository(RepositoryBase):
 
     async def _process_batch_async(self, seed_keyword: str, batch_titles: List[str]) -> OpenAiExtractionResult:
         """
-        単一のタイトルバッチに対してOpenAI APIコールを非同期(スレッド)で実行します。
+        単一のタイトルバッチに対してOpenAI APIコールを非同期で実行します。
+        """
+        cache_key = self._cache_key(seed_keyword, batch_titles)
+        while True:
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Related keywords served from cache.", seed_keyword=seed_keyword)
+                return cached
+
+            # 同じバッチの抽出が実行中であれば、その結果を待つ
+            inflight = self._result_inflight.get(cache_key)
+            if inflight is None:
+                break
+            result = await asyncio.shield(inflight)
+            if result is not None:
+                return result
+            # 実行中の呼び出しがキャンセルされた (None が渡された) 場合は、キャッシュ確認からやり直して自身で抽出する
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._result_inflight[cache_key] = future
+        try:
+            # AsyncOpenAI を直接 await し、バッチ毎にスレッドを消費しない (既定 Executor のワーカー数に縛られない)
+            # 失敗は空の結果にせず例外として返し、呼び出し側で失敗したバッチを区別できるようにする
+            result = await self._aextract_related_keywords(seed_keyword, batch_titles)
+            future.set_result(result)
+            return result
+        finally:
+            # 例外・キャンセルで結果を設定できなかった場合は、Future をキャンセルせず None を渡す
+            # (待機中の呼び出しまで CancelledError で失敗させず、それぞれに再実行させるため)
+            if not future.done():
+                future.set_result(None)
+            self._result_inflight.pop(cache_key, None)
+
+    @staticmethod
+    def _estimate_title_tokens(title: str) -> int:
+        """
+        番号付きの 1 行としてプロンプトに載せたときのトークン数を概算します。
+        (ASCII はおよそ 4 文字で 1 トークン、日本語などの非 ASCII は 1 文字 1 トークン程度として見積もる)
+        """
+        ascii_chars = len(title.encode('ascii', 'ignore'))
+        return (len(title) - ascii_chars) + ascii_chars // 4 + 3
+
+    def _split_batches(self, titles: List[str]) -> List[List[str]]:
+        """タイトルを正規化・重複除去したうえで、件数とトークン数の上限に収まるバッチに分割します。"""
+        # 重複タイトルでトークン・リクエストを浪費しないよう、正規化して重複を除いてから分割する
+        deduped_titles = self._dedupe_titles(titles)
+        if len(deduped_titles) < len(titles):
+            logger.info("Duplicate titles removed before batching.",
+                        original=len(titles), deduped=len(deduped_titles))
+
+        # タイトル件数 (BATCH_SIZE) と推定トークン数 (BATCH_MAX_TITLE_TOKENS) の両方に収まるよう、先頭から詰めて分割する
+        batches: List[List[str]] = []
+        batch: List[str] = []
+        batch_tokens = 0
+        for title in deduped_titles:
+            tokens = self._estimate_title_tokens(title)
+            if batch and (len(batch) >= self.BATCH_SIZE or batch_tokens + tokens > self.BATCH_MAX_TITLE_TOKENS):
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+            batch.append(title)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+
+        logger.info("OpenAI extraction split into batches for parallel processing (ASYNC).", batches=len(batches))
+        return batches
+
+    # -----------------------------------------------------------
+    # Batch API (非リアルタイム処理向け。ライブ呼び出しの半額で、レート制限も別枠)
+    # -----------------------------------------------------------
+
+    # Batch の終了状態 (これ以外の状態の間はポーリングを続ける)
+    BATCH_TERMINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+    def _build_batch_file(self, jobs: List[Tuple[str, List[str]]]) -> bytes:
+        """jobs を Batch API の入力 (1 行 1 リクエストの JSONL) に変換します。custom_id は jobs のインデックスです。"""
+        return b"".join(
+            orjson.dumps({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.MODEL,
+                    "messages": self._build_messages(self.SYSTEM_PROMPT, self._generate_prompt(seed_keyword, titles)),
+                    "response_format": self.RESPONSE_FORMAT,
+                },
+            }) + b"\n"
+            for index, (seed_keyword, titles) in enumerate(jobs)
+        )
+
+    async def submit_batch(self, jobs: List[Tuple[str, List[str]]]) -> str:
+        """jobs を 1 つの Batch としてアップロード・投入し、Batch ID を返します。"""
+        input_file = await self.aclient.files.create(
+            file=("related_keywords.jsonl", self._build_batch_file(jobs)),
+            purpose="batch",
+        )
+        batch = await self.aclient.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info("OpenAI batch submitted.", batch_id=batch.id, jobs=len(jobs))
+        return batch.id
+
+    async def wait_for_batch(self, batch_id: str, jobs: List[Tuple[str, List[str]]]) -> List[OpenAiExtractionResult]:
+        """
+        Batch の完了をポーリングで待ち、jobs と同じ順序で抽出結果を返します。
+        (失敗・期限切れ・待機上限を超えた Batch や、個別に失敗したリクエストは空リスト)
+        """
+        results: List[OpenAiExtractionResult] = [[] for _ in jobs]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settings.openai_batch_timeout_seconds
+        while True:
+            batch = await self.aclient.batches.retrieve(batch_id)
+            if batch.status in self.BATCH_TERMINAL_STATUSES:
+                break
+            if loop.time() >= deadline:
+                # 待機上限を超えた Batch は取り消す (取り消しに失敗しても、結果は空として扱う)
+                logger.error("OpenAI batch timed out.", batch_id=batch_id, status=batch.status,
+                             timeout=self.settings.openai_batch_timeout_seconds)
+                try:
+                    await self.aclient.batches.cancel(batch_id)
+                except OpenAIError as e:
+                    logger.error("Failed to cancel OpenAI batch.", batch_id=batch_id, error=str(e))
+                return results
+            logger.debug("Waiting for OpenAI batch.", batch_id=batch_id, status=batch.status)
+            await asyncio.sleep(min(self.settings.openai_batch_poll_interval_seconds,
+                                    max(deadline - loop.time(), 0.0)))
+
+        if batch.status != "completed" or batch.output_file_id is None:
+            logger.error("OpenAI batch did not complete.", batch_id=batch_id, status=batch.status)
+            return results
+
+        output = await self.aclient.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line:
+                continue
+            try:
+                record = orjson.loads(line)
+                index = int(record["custom_id"])
+                seed_keyword, titles = jobs[index]
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    logger.error("OpenAI batch request failed.", batch_id=batch_id, seed_keyword=seed_keyword,
+                                 error=record.get("error"))
+                    continue
+                json_string = response["body"]["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                # 出力ファイルの行が想定外の形式の場合は、その行だけ読み飛ばす
+                logger.error("Malformed OpenAI batch output.", batch_id=batch_id, error=str(e), raw_line=line)
+                continue
+            try:
+                result = self._parse_related_keywords(json_string)
+            except ValidationError as e:
+                logger.error("Failed to decode OpenAI response.", errors=e.errors(), raw_content=json_string)
+                continue
+            if result:
+                self._result_cache.set(self._cache_key(seed_keyword, titles), result)
+            results[index] = result
+
+        logger.info("OpenAI batch completed.", batch_id=batch_id,
+                    succeeded=sum(1 for result in results if result), jobs=len(jobs))
+        return results
+
+    async def extract_related_keywords_via_batch_api(self, seed_keyword: str,
+                                                     titles: List[str]) -> OpenAiExtractionResult:
+        """
+        async_extract_related_keywords_batch の Batch API 版。全バッチを 1 つの Batch として投入し、完了まで待機します。
+        応答まで数分〜最大 24 時間かかるため、バックグラウンドタスクからのみ利用します。
+        """
+        jobs = [(seed_keyword, batch) for batch in self._split_batches(titles)]
+        if not jobs:
+            return []
+        try:
+            batch_id = await self.submit_batch(jobs)
+            results = await self.wait_for_batch(batch_id, jobs)
+        except OpenAIError as e:
+            logger.error("OpenAI batch API call failed.", seed_keyword=seed_keyword, error=str(e))
+            return []
+        except Exception:
+            # 想定外の例外もスタックトレース付きでログに残し、呼び出し元には空の結果を返す
+            logger.exception("Unexpected error during OpenAI batch API call.", seed_keyword=seed_keyword)
+            return []
+
+        final_result: OpenAiExtractionResult = []
+        for result in results:
+            final_result.extend(result)
+        return final_result
+
+    async def iter_extract_related_keywords_batch(
+            self, seed_keyword: str, titles: List[str]) -> AsyncIterator[OpenAiExtractionResult | Exception]:
+        """
+        async_extract_related_keywords_batch のストリーミング版。
+        全バッチの完了を待たず、完了したバッチから順に結果を返します (失敗したバッチは、結果の代わりにその例外を返します)。
         """
-        # 同期関数を asyncio.to_thread でラップし、メインイベントループをブロックしないようにする
-        return await asyncio.to_thread(self.extract_related_keywords, seed_keyword, batch_titles)
+        tasks = [
+            asyncio.create_task(self._process_batch_async(seed_keyword, batch))
+            for batch in self._split_batches(titles)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    result: OpenAiExtractionResult | Exception = await next_done
+                except Exception as e:
+                    logger.error("A batch failed during parallel execution.", seed_keyword=seed_keyword, error=str(e))
+                    result = e
+                yield result
+        finally:
+            # 呼び出し側が途中で打ち切った (クライアント切断など) 場合は、残りのバッチを取り消す
+            for task in tasks:
+                task.cancel()
 
     async def async_extract_related_keywords_batch(self, seed_keyword: str,
                                                    titles: List[str]) -> OpenAiExtractionResult:
         """
         タイトルリストをバッチに分割し、OpenAI APIを並列で実行します。(非同期処理)
         """
-        # タイトルリストをバッチに分割
-        batches: List[List[str]] = [
-            titles[i:i + self.BATCH_SIZE]
-            for i in range(0, len(titles), self.BATCH_SIZE)
-        ]
-
-        logger.info(f"OpenAI extraction split into {len(batches)} batches for parallel processing (ASYNC).")
+        batches = self._split_batches(titles)
 
         # 各バッチの処理タスクを作成
         tasks: List[Awaitable[OpenAiExtractionResult]] = [
@@ -362,9 +572,6 @@ class OpenAiRepository(RepositoryBase):
                 final_result.extend(result)
             else:
                 # バッチ処理中に例外が発生した場合
-                logger.error("A batch failed during parallel execution.", exception=result)
-
-        # 重複排除が必要な場合は、ここで実装します。
-        # (例: return list({frozenset(d.items()): d for d in final_result}.values()))
+                logger.error("A batch failed during parallel execution.", seed_keyword=seed_keyword, error=str(result))
 
         return final_result
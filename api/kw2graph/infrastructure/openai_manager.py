@@ -0,0 +1,65 @@
+import structlog
+from openai import AsyncOpenAI, OpenAI
+
+from kw2graph import config
+
+logger = structlog.get_logger(__name__)
+
+
+class OpenAiClientManager:
+    """
+    OpenAI / AsyncOpenAI Clientの生成と破棄を管理し、Clientインスタンスを提供するクラス。
+    FastAPIのライフサイクルイベント（startup/shutdown）からのみ利用される。
+    """
+
+    def __init__(self):
+        self._client: OpenAI | None = None
+        self._aclient: AsyncOpenAI | None = None
+
+    def initialize(self, settings: config.Settings):
+        """OpenAIクライアントを初期化します。"""
+        if self._client:
+            logger.warning("OpenAiClientManager is already initialized.")
+            return
+
+        logger.info("Initializing OpenAI Clients.")
+
+        # リクエスト毎に httpx のコネクションプールを作り直さず、api.openai.com への接続を使い回す
+        # 一時的な失敗 (レート制限 / 5xx / 接続断) は SDK 側で再試行し、空の結果として扱わないようにする
+        # (スキーマ不正などの応答内容の失敗は再試行されない)
+        client_options = dict(
+            api_key=settings.openai_api_key,
+            max_retries=settings.openai_max_retries,
+            timeout=settings.openai_timeout_seconds,
+        )
+        self._client = OpenAI(**client_options)
+        self._aclient = AsyncOpenAI(**client_options)
+
+    async def close(self):
+        """OpenAIクライアントを明示的にクローズします。"""
+        if self._client:
+            logger.info("Closing OpenAI Clients.")
+            try:
+                self._client.close()
+                await self._aclient.close()
+                self._client = None
+                self._aclient = None
+            except Exception as e:
+                logger.error("Error during OpenAI client close.", error=str(e))
+
+    def get_client(self) -> OpenAI:
+        """初期化済みの OpenAI Client インスタンスを返します。"""
+        if not self._client:
+            # 起動イベントで初期化されることを前提としているため、通常は発生しない
+            raise RuntimeError("OpenAI Client is not initialized. Check startup event configuration.")
+        return self._client
+
+    def get_async_client(self) -> AsyncOpenAI:
+        """初期化済みの AsyncOpenAI Client インスタンスを返します。"""
+        if not self._aclient:
+            raise RuntimeError("AsyncOpenAI Client is not initialized. Check startup event configuration.")
+        return self._aclient
+
+
+# 💡 アプリケーション全体で共有するマネージャーインスタンス
+GLOBAL_OPENAI_MANAGER = OpenAiClientManager()
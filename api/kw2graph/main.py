@@ -1,35 +1,47 @@
-import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from typing import List
 
 import structlog
 from fastapi import FastAPI, Depends, BackgroundTasks, Query
+from fastapi.encoders import jsonable_encoder
 from fastapi.exception_handlers import http_exception_handler
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.middleware.cors import CORSMiddleware
 from starlette.status import HTTP_202_ACCEPTED
 
 from kw2graph import settings
+from kw2graph.infrastructure.elasticsearch_manager import GLOBAL_ELASTICSEARCH_MANAGER
 from kw2graph.infrastructure.graphdb import GraphDatabaseRepository
 from kw2graph.infrastructure.gremlin_manager import GLOBAL_GREMLIN_MANAGER
+from kw2graph.infrastructure.openai_manager import GLOBAL_OPENAI_MANAGER
 from kw2graph.usecase.analyze_keywords import AnalyzeKeywordsUseCase
 from kw2graph.usecase.get_candidate import GetCandidateUseCase
 from kw2graph.usecase.create_graph import CreateGraphUseCase
 from kw2graph.usecase.input.analyze_keywords import AnalyzeKeywordsInput
 from kw2graph.usecase.input.get_candidate import GetCandidateInput
 from kw2graph.usecase.input.create_graph import CreateGraphInput
-from kw2graph.usecase.output.analyze_keywords import AnalyzeKeywordsOutput
+from kw2graph.usecase.output.analyze_keywords import AnalyzeKeywordsOutput, AnalyzeKeywordsOutputItem
 from kw2graph.usecase.output.get_candidate import GetCandidateOutput
 from kw2graph.usecase.output.create_graph import CreateGraphOutput
 from kw2graph.usecase.show_graph import ShowGraphUseCase
-from kw2graph.usecase.output.show_graph import ShowGraphOutput
+from kw2graph.usecase.output.show_graph import ShowGraphOutput, Node, Edge
 from kw2graph.usecase.input.show_graph import ShowGraphInput
 from kw2graph.usecase.submit_graph_analysis import SubmitGraphAnalysisUseCase
 from kw2graph.usecase.submit_task import SubmitTaskUseCase
 from kw2graph.usecase.output.submit_task import SubmitTaskOutput
 from kw2graph.usecase.input.submit_task import SubmitTaskInput
+from kw2graph.util.text_formatter import shutdown_process_pool
+
+# 無効なレベルのログは BoundLogger の段階で no-op にし、イベント辞書の組み立て・レンダリングを省略する
+structlog.configure(
+    wrapper_class=structlog.make_filtering_bound_logger(logging.getLevelName(settings.log_level.upper())),
+    cache_logger_on_first_use=True,
+)
 
 logger = structlog.get_logger(__name__)
 
@@ -43,20 +55,34 @@ async def lifespan(app: FastAPI):
     logger.info("Application startup: Initializing resources.")
 
     # 起動処理 (yield の前)
+    # asyncio.to_thread の既定 Executor (min(32, CPU数 + 4) スレッド) を、I/O 待ちの並行数に合わせて拡張する
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.default_executor_max_workers))
     GLOBAL_GREMLIN_MANAGER.initialize(settings)  # Gremlinクライアントの作成
+    GLOBAL_ELASTICSEARCH_MANAGER.initialize(settings)  # AsyncElasticsearchクライアントの作成
+    GLOBAL_OPENAI_MANAGER.initialize(settings)  # OpenAI / AsyncOpenAIクライアントの作成
+    # スキーマ構築を遅延させている出力モデルのうち、要素数の多い応答で使うものは起動時に構築しておく
+    for model in (Node, Edge, ShowGraphOutput, AnalyzeKeywordsOutputItem, AnalyzeKeywordsOutput):
+        model.model_rebuild()
+    # 起点ノード検索の実行計画をログに出力し、インデックスが使われているか確認できるようにする
+    await GraphDatabaseRepository(settings, GLOBAL_GREMLIN_MANAGER.get_client()).warmup()
 
     yield  # ここでアプリケーションがリクエストの処理を開始する
 
     # シャットダウン処理 (yield の後)
     logger.info("Application shutdown: Cleaning up resources.")
     GLOBAL_GREMLIN_MANAGER.close()  # Gremlinクライアントのクローズ
+    await GLOBAL_ELASTICSEARCH_MANAGER.close()  # AsyncElasticsearchクライアントのクローズ
+    await GLOBAL_OPENAI_MANAGER.close()  # OpenAIクライアントのクローズ
+    shutdown_process_pool()  # タイトル正規化用プロセスプールの破棄
 
 
 app = FastAPI(
     title="KW2Graph API",
     version="0.1.0",
     lifespan=lifespan,
-    default_response_class=JSONResponse
+    # 応答のシリアライズを C 実装の orjson で行う
+    default_response_class=ORJSONResponse
 )
 
 origins = [
@@ -101,6 +127,22 @@ async def analyze(request: AnalyzeKeywordsInput):
     return response
 
 
+@app.post('/analyze/stream')
+async def analyze_stream(request: AnalyzeKeywordsInput):
+    """
+    /analyze のストリーミング版。全バッチの完了を待たず、完了したバッチから順に
+    AnalyzeKeywordsOutput (バッチ毎の上位 N 件) を 1 行 1 JSON (NDJSON) で返す。
+    抽出に失敗したバッチは {"keyword": ..., "error": ...} (AnalyzeKeywordsStreamError) の行として返す。
+    """
+    use_case = AnalyzeKeywordsUseCase(settings)
+
+    async def generate():
+        async for output in use_case.execute_stream(request):
+            yield output.model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 @app.post('/create', response_model=CreateGraphOutput)
 async def create_graph(
         request: CreateGraphInput,
@@ -169,30 +211,31 @@ async def show_graph(
     )
 
     use_case = ShowGraphUseCase(settings, graph_repo=repo)
-    response = await use_case.execute(request)
-
-    return response
+    # 応答本文はユースケースで直接 JSON バイト列にし、
+    # response_model による再検証と jsonable_encoder を経由した dict への変換を省く
+    # (response_model はスキーマ (OpenAPI) の定義のみに使われる)
+    return Response(content=await use_case.execute_json(request), media_type="application/json")
 
 
 @app.exception_handler(RequestValidationError)
-async def handle_request_validation_error(request, exc) -> JSONResponse:
-    logger.error(f'Bad Request. invalid parameters specified. {exc.raw_errors}')
-    return JSONResponse(
+async def handle_request_validation_error(request, exc) -> ORJSONResponse:
+    logger.error("Bad Request. invalid parameters specified.", errors=exc.errors())
+    return ORJSONResponse(
         status_code=400,
-        content=json.loads(exc.json()),
+        content=jsonable_encoder(exc.errors()),
     )
 
 
 @app.exception_handler(StarletteHTTPException)
 async def handle_http_exception(request, exc):
-    logger.error(f'HTTP Exception occurred. code: {exc.status_code} detail: {exc.detail}')
+    logger.error("HTTP Exception occurred.", code=exc.status_code, detail=exc.detail)
     return await http_exception_handler(request, exc)
 
 
 @app.middleware("http")
 async def intercept_http_requests(req, call_next):
     res = await call_next(req)
-    logger.info(f'{req.method}: {req.url.path} query: {req.query_params} headers: {req.headers}')
+    logger.info("HTTP request.", method=req.method, path=req.url.path, query=req.query_params, headers=req.headers)
 
     return res
 
@@ -1,7 +1,9 @@
+from typing import AsyncIterator
+
 from kw2graph.domain.keywords_analyzer import KeywordsAnalyzerService
 from kw2graph.usecase.base import UseCaseBase
 from kw2graph.usecase.input.analyze_keywords import AnalyzeKeywordsInput
-from kw2graph.usecase.output.analyze_keywords import AnalyzeKeywordsOutput
+from kw2graph.usecase.output.analyze_keywords import AnalyzeKeywordsOutput, AnalyzeKeywordsStreamError
 
 
 class AnalyzeKeywordsUseCase(UseCaseBase):
@@ -11,3 +13,8 @@ class AnalyzeKeywordsUseCase(UseCaseBase):
 
     async def execute(self, in_data: AnalyzeKeywordsInput) -> AnalyzeKeywordsOutput:
         return await self.analyzer.analyze(in_data, use_batch=True)
+
+    def execute_stream(
+            self, in_data: AnalyzeKeywordsInput) -> AsyncIterator[AnalyzeKeywordsOutput | AnalyzeKeywordsStreamError]:
+        """バッチ毎の抽出結果 (失敗したバッチは AnalyzeKeywordsStreamError) を、完了した順に返します。"""
+        return self.analyzer.analyze_stream(in_data)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class InputBase(BaseModel):
-    pass
+    # スキーマ (pydantic-core のバリデータ/シリアライザ) の構築を import 時ではなく初回利用時まで遅延させる
+    model_config = ConfigDict(defer_build=True)
@@ -11,5 +11,16 @@ class AnalyzeKeywordsOutputItem(OutputBase):
 
 
 class AnalyzeKeywordsOutput(OutputBase):
+    """
+    関連キーワードの抽出結果 (スコア上位 N 件。N は KeywordsAnalyzerService.TOP_N_LIMIT)。
+    /analyze では全バッチを合わせた上位 N 件、/analyze/stream ではバッチ毎の上位 N 件を 1 行ずつ返す
+    (ストリームの各行は全体の上位 N 件ではないため、全体の上位 N 件が必要な場合は呼び出し側で集約する)。
+    """
     seed_keyword: str
     results: List[AnalyzeKeywordsOutputItem]
+
+
+class AnalyzeKeywordsStreamError(OutputBase):
+    """/analyze/stream で抽出に失敗したバッチ 1 件を表す行 (結果の行と区別できるよう、results を持たない)。"""
+    keyword: str
+    error: str
@@ -1,9 +1,11 @@
+import orjson
+
 from kw2graph import config
 from kw2graph.domain.graph_fetcher import GraphFetcherService
 from kw2graph.infrastructure.graphdb import GraphDatabaseRepository
 from kw2graph.usecase.base import UseCaseBase
 from kw2graph.usecase.input.show_graph import ShowGraphInput
-from kw2graph.usecase.output.show_graph import ShowGraphOutput
+from kw2graph.usecase.output.show_graph import ShowGraphOutput, Node, Edge
 
 
 class ShowGraphUseCase(UseCaseBase):
@@ -14,8 +16,30 @@ class ShowGraphUseCase(UseCaseBase):
     async def execute(self, in_data: ShowGraphInput) -> ShowGraphOutput:
         # ドメインサービスからグラフデータを取得
         graph_data = await self.fetcher.fetch(in_data)
+        if self.settings.trust_graphdb_payload:
+            # リポジトリで型を整形済みのため、ノード/エッジ毎のバリデーションを省略して構築する
+            return ShowGraphOutput.model_construct(
+                nodes=[Node.model_construct(**node) for node in graph_data.get('nodes', [])],
+                edges=[Edge.model_construct(**edge) for edge in graph_data.get('edges', [])],
+            )
         # 辞書の結果をPydanticモデルに変換して返す
         return ShowGraphOutput(
             nodes=graph_data.get('nodes', []),
             edges=graph_data.get('edges', [])
         )
+
+    async def execute_json(self, in_data: ShowGraphInput) -> bytes:
+        """
+        execute と同じグラフを、API の応答本文 (JSON バイト列) として返します。
+        trust_graphdb_payload が有効な場合はノード/エッジのモデルを作らず、リポジトリの dict を orjson で直接シリアライズします。
+        """
+        if not self.settings.trust_graphdb_payload:
+            # 検証済みの出力モデルを pydantic-core (Rust 実装) で直接 JSON バイト列にする
+            return (await self.execute(in_data)).model_dump_json().encode()
+
+        graph_data = await self.fetcher.fetch(in_data)
+        # リポジトリの dict は Node / Edge と同じキー・型に整形済みのため、そのまま ShowGraphOutput の形で出力する
+        return orjson.dumps({
+            'nodes': graph_data.get('nodes', []),
+            'edges': graph_data.get('edges', []),
+        })
@@ -1,6 +1,9 @@
 import asyncio
-
 import re
+from functools import lru_cache
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List
+
 import structlog
 
 from kw2graph import config
@@ -16,8 +19,19 @@ from kw2graph.util.text_formatter import TextFormatter
 
 logger = structlog.get_logger(__name__)
 
+# キーワード末尾の括弧書きの文脈情報 (例: ' (ちいかわの文脈)')。末尾の ' (' から ')' までにマッチする
+_KEYWORD_CONTEXT_PATTERN = re.compile(r' \([^)]+\)$')
+
+_get_snippet = itemgetter('snippet')
+_get_title = itemgetter('title')
+
 
 class SubmitGraphAnalysisUseCase(UseCaseBase):
+    # 解析に必要なのはタイトルのみのため、ES からはこのフィールドだけを取得する
+    TITLE_SOURCE_FIELD = 'snippet.title'
+    # 階層毎の候補取得で 1 回の msearch にまとめるキーワード数の上限
+    MSEARCH_BATCH_SIZE = 50
+
     def __init__(self, settings: config.Settings,
                  graph_repo: GraphDatabaseRepository):
         super().__init__(settings)
@@ -26,12 +40,17 @@ class SubmitGraphAnalysisUseCase(UseCaseBase):
         # 既存の分析サービスを初期化（ここではリポジトリを直接注入せず、サービスを初期化）
         self.fetcher = ContentsFetcherService(settings)
         self.analyzer_service = KeywordsAnalyzerService(settings)
+        # ES 取得 / GraphDB 登録の段毎の同時実行数。遅い段で待つキーワードが他の段の枠を占有しないよう、段単位で制限する
+        self._fetch_semaphore = asyncio.Semaphore(settings.recursive_fetch_concurrency)
+        self._register_semaphore = asyncio.Semaphore(settings.recursive_register_concurrency)
 
     async def execute(self, in_data: SubmitTaskInput):
         """
         最初の起点キーワードの解析と登録を実行し、その後、再帰的な探索をトリガーします。
         """
         logger.info("START: Initial graph analysis task.", keyword=in_data.seed_keyword)
+        # この実行内で解析済み (またはスケジュール済み) のキーワード。階層をまたいだ再解析を防ぐ
+        self._visited: set[str] = {in_data.seed_keyword}
 
         # 1. 最初の起点キーワードの処理を実行
         success = await self._process_single_keyword(in_data)
@@ -41,19 +60,20 @@ class SubmitGraphAnalysisUseCase(UseCaseBase):
 
             # 2. ステップ 2: 最初のホップ（階層 1）の自動探索を開始
             # 必須条件: entity_type='Proper', score >= 0.90
-            await self.execute_recursive_analysis(
+            depth1_keywords = await self.execute_recursive_analysis(
                 in_data=in_data,
-                seed_keyword=in_data.seed_keyword,
+                seed_keywords=[in_data.seed_keyword],
                 min_score=0.90,
                 entity_type='Proper',
                 depth=1  # 最初のホップ
             )
 
             # 3. ステップ 3: 2番目のホップ（階層 2）の自動探索を開始
+            # 階層 1 で登録したキーワード群を起点とし、1 回のクエリでまとめて候補を探す
             # 必須条件: entity_type='Proper', score >= 0.95 (より厳しく)
             await self.execute_recursive_analysis(
                 in_data=in_data,
-                seed_keyword=in_data.seed_keyword,
+                seed_keywords=depth1_keywords,
                 min_score=0.95,
                 entity_type='Proper',
                 depth=2  # 2番目のホップ
@@ -67,102 +87,157 @@ class SubmitGraphAnalysisUseCase(UseCaseBase):
     # -----------------------------------------------------
     async def execute_recursive_analysis(self,
                                          in_data: SubmitTaskInput,
-                                         seed_keyword: str,
+                                         seed_keywords: List[str],
                                          min_score: float,
                                          entity_type: str,
-                                         depth: int):
+                                         depth: int) -> List[str]:
         """
         GraphDBから条件に合う新しいキーワードを発見し、それぞれに対して解析タスクを実行します。
+        複数の起点キーワードの候補は 1 回の round-trip でまとめて取得します。
+        解析・登録に成功したキーワード (次の階層の起点候補) を返します。
         """
-        logger.info(f"START: Recursive discovery at Depth {depth}.",
-                    source_keyword=seed_keyword, min_score=min_score)
+        logger.info("START: Recursive discovery.", depth=depth,
+                    source_keywords=seed_keywords, min_score=min_score)
+
+        if not seed_keywords:
+            logger.info("No source keywords for recursive discovery.", depth=depth)
+            return []
 
-        # 1. GraphDBから次の階層の新しいキーワード候補を取得
-        # Note: Gremlinメソッドは depth=1 で呼び出し、直近の関連ノードのみを探す
-        new_keywords = await self.graph_repo.get_new_and_eligible_keywords(
-            seed_keyword=seed_keyword,
+        # 1. GraphDBから次の階層の新しいキーワード候補を取得 (起点の直近の関連ノードのみを探す)
+        new_keywords_by_seed = await self.graph_repo.get_new_and_eligible_keywords_many(
+            seed_keywords=seed_keywords,
             min_score=min_score,
             entity_type=entity_type,
-            max_depth=1
         )
 
+        # 前の階層までに解析済みのキーワードを除く (文脈の括弧書きを除いた名前で判定する)
+        new_keywords = []
+        for found_keywords in new_keywords_by_seed.values():
+            for new_kw in found_keywords:
+                cleaned_keyword = self._clean_keyword_context(new_kw)
+                if cleaned_keyword not in self._visited:
+                    self._visited.add(cleaned_keyword)
+                    new_keywords.append(cleaned_keyword)
+
         if not new_keywords:
-            logger.info(f"No new eligible keywords found at Depth {depth}.")
-            return
+            logger.info("No new eligible keywords found.", depth=depth)
+            return []
+
+        logger.info("Discovered new keywords. Starting parallel processing.", depth=depth, count=len(new_keywords))
+
+        # 2. 発見された全キーワードの候補タイトルを msearch でまとめて取得する
+        # (キーワード毎の search を MSEARCH_BATCH_SIZE 件ずつ 1 round-trip にまとめる)
+        candidates_by_keyword = await self._fetch_candidates_many(in_data, new_keywords)
+
+        # 3. 発見された各キーワードに対して並列で解析と登録を実行
+        # (処理中のキーワード数を制限し、各段の同時実行数は _process_single_keyword 内で段毎に制限する)
+        semaphore = asyncio.Semaphore(self.settings.max_recursive_concurrency)
 
-        logger.info(f"Discovered {len(new_keywords)} new keywords at Depth {depth}. Starting parallel processing.")
+        async def guarded(task_input: SubmitTaskInput) -> tuple[str, bool]:
+            async with semaphore:
+                candidates = candidates_by_keyword[task_input.seed_keyword]
+                return task_input.seed_keyword, await self._process_single_keyword(task_input, candidates)
 
-        # 2. 発見された各キーワードに対して並列で解析と登録を実行
         tasks = []
-        for new_kw in new_keywords:
-            cleaned_seed_keyword = self._clean_keyword_context(new_kw)
+        for cleaned_seed_keyword in new_keywords:
             # 新しいキーワードを起点とするタスクを準備
-            new_input = SubmitTaskInput(
-                seed_keyword=cleaned_seed_keyword,
-                index=in_data.index,
-                field=in_data.field,
-                max_titles=in_data.max_titles  # タイトル数は設定値を利用
-            )
+            # (index / field / max_titles は検証済みの入力を引き継ぐため、起点キーワードのみ差し替えて複製する)
+            new_input = in_data.model_copy(update={'seed_keyword': cleaned_seed_keyword})
             # 各タスクは _process_single_keyword を実行する
-            tasks.append(self._process_single_keyword(new_input))
-
-        # 3. すべてのタスクを並列で待機
-        await asyncio.gather(*tasks, return_exceptions=False)
-
-        logger.info(f"FINISH: Recursive discovery at Depth {depth} completed.")
+            tasks.append(guarded(new_input))
+
+        # 4. 完了したタスクから順に結果を受け取る (最も遅いタスクを待たずに進捗を記録する)
+        registered_keywords: List[str] = []
+        for next_done in asyncio.as_completed(tasks):
+            keyword, success = await next_done
+            if success:
+                registered_keywords.append(keyword)
+            logger.debug("Keyword analysis finished.", keyword=keyword, success=success, depth=depth,
+                         completed=len(registered_keywords))
+
+        logger.info("FINISH: Recursive discovery completed.", depth=depth,
+                    registered=len(registered_keywords), scheduled=len(tasks))
+        return registered_keywords
+
+    async def _fetch_candidates_many(self, in_data: SubmitTaskInput,
+                                     keywords: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        複数キーワードの候補 (_source) を MSEARCH_BATCH_SIZE 件ずつの msearch で取得し、キーワード毎に返します。
+        (msearch の同時実行数は ES 取得段の制限に従う)
+        """
+        async def fetch_chunk(chunk: List[str]):
+            async with self._fetch_semaphore:
+                return await self.fetcher.fetch_many(in_data.index, in_data.field, chunk,
+                                                     source_fields=[self.TITLE_SOURCE_FIELD])
+
+        batch_size = self.MSEARCH_BATCH_SIZE
+        chunk_outputs = await asyncio.gather(*(
+            fetch_chunk(keywords[i:i + batch_size]) for i in range(0, len(keywords), batch_size)
+        ))
+        return {output.seed_keyword: output.candidates for outputs in chunk_outputs for output in outputs}
 
     # -----------------------------------------------------
     # 💡 新規: 単一のキーワードの解析と登録を実行するヘルパーメソッド
     # -----------------------------------------------------
-    async def _process_single_keyword(self, in_data: SubmitTaskInput) -> bool:
+    async def _process_single_keyword(self, in_data: SubmitTaskInput,
+                                      candidates: Iterable[Dict[str, Any]] | None = None) -> bool:
         """
         単一のキーワードに対して、Elasticsearch取得 -> OpenAI解析 -> GraphDB登録を一貫して実行します。
+        candidates (取得済みの _source) が渡された場合は、Elasticsearch への検索を省略します。
         """
-        logger.debug(f"Processing single keyword: {in_data.seed_keyword}")
-
-        # 1. Elasticsearchからタイトルを取得
-        # ... (fetcher.fetch のロジックは前のコードを参照)
-        search_result = await self.fetcher.fetch(GetCandidateInput(
-            index=in_data.index,
-            field=in_data.field,
-            keyword=in_data.seed_keyword,
-        ))
+        # 無効なログレベルでは no-op になるよう、メッセージは固定文字列とし値は kwargs で渡す
+        logger.debug("Processing single keyword.", keyword=in_data.seed_keyword)
+
+        # 1. Elasticsearchからタイトルを取得 (再帰探索では呼び出し元が msearch で取得済み)
+        if candidates is None:
+            async with self._fetch_semaphore:
+                candidates = await self.fetcher.fetch_iter(GetCandidateInput(
+                    index=in_data.index,
+                    field=in_data.field,
+                    keyword=in_data.seed_keyword,
+                ), source_fields=[self.TITLE_SOURCE_FIELD])
 
-        # titles = [c['snippet']['title'] for c in candidates]
-        titles = []
-        for candidate in search_result.candidates:
-            titles.append(candidate['snippet']['title'])
+        # ヒット -> タイトル抽出 -> 正規化を1パスで行い、OpenAIへ渡すリストのみを実体化する
+        titles = map(_get_title, map(_get_snippet, candidates))
 
         # 2. 前処理 (正規化とフィルタリング)
-        normalized_titles = self.formatter.normalize_titles_list(titles)
+        normalized_titles = await self.formatter.anormalize_titles_list(titles)
         if not normalized_titles: return False
 
         # 3. OpenAIで非同期バッチ解析
-        analyze_output = await self.analyzer_service.analyze(
-            in_data=AnalyzeKeywordsInput(seed_keyword=in_data.seed_keyword, children=normalized_titles),
-            use_batch=True
-        )
+        # (バックグラウンド処理のため、設定により半額の Batch API で投入し、完了を待つ)
+        analyze_input = AnalyzeKeywordsInput(seed_keyword=in_data.seed_keyword, children=normalized_titles)
+        if self.settings.openai_use_batch_api:
+            analyze_output = await self.analyzer_service.analyze_via_batch_api(analyze_input)
+        else:
+            analyze_output = await self.analyzer_service.analyze(in_data=analyze_input, use_batch=True)
         if not analyze_output.results: return False
 
-        # 4. GraphDBへの登録
-        registration_data = [
-            {'keyword': item.keyword, 'score': item.score, 'iab_categories': item.iab_categories,
-             'entity_type': item.entity_type}
-            for item in analyze_output.results
-        ]
+        # 4. GraphDBへの登録 (要素毎の dict を作らず、項目毎の並列リストに 1 パスで変換して渡す)
+        keywords, scores, iab_categories, entity_types = [], [], [], []
+        for item in analyze_output.results:
+            keywords.append(item.keyword)
+            scores.append(item.score)
+            iab_categories.append(item.iab_categories)
+            entity_types.append(item.entity_type)
 
         # channel_name は省略
         channel_name = None
 
-        success = await self.graph_repo.register_related_keywords(
-            seed_keyword=in_data.seed_keyword,
-            extracted_data=registration_data,
-            channel_name=channel_name
-        )
+        async with self._register_semaphore:
+            success = await self.graph_repo.register_related_keywords_columnar(
+                seed_keyword=in_data.seed_keyword,
+                keywords=keywords,
+                scores=scores,
+                iab_categories=iab_categories,
+                entity_types=entity_types,
+                channel_name=channel_name
+            )
         return success
 
     @staticmethod
+    @lru_cache(maxsize=8192)
     def _clean_keyword_context(keyword: str) -> str:
         """キーワードから末尾の括弧書きの文脈情報 (例: ' (ちいかわの文脈)') を削除する。"""
-        # 正規表現: 末尾の ' (' から ')' までを非貪欲にマッチさせ、削除
-        return re.sub(r' \([^)]+\)$', '', keyword).strip()
+        # 再帰探索では同じキーワードが繰り返し現れるため、結果をプロセス全体でメモ化する
+        return _KEYWORD_CONTEXT_PATTERN.sub('', keyword).strip()
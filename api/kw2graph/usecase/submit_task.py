@@ -1,3 +1,5 @@
+from operator import itemgetter
+
 import structlog
 
 from kw2graph import config
@@ -13,6 +15,9 @@ from kw2graph.domain.keywords_analyzer import KeywordsAnalyzerService  # 既存
 
 logger = structlog.get_logger(__name__)
 
+_get_snippet = itemgetter('snippet')
+_get_title = itemgetter('title')
+
 
 # 仮定: このユースケースのInput/Outputモデルはシンプル
 
@@ -40,9 +45,8 @@ class SubmitTaskUseCase(UseCaseBase):
             keyword=in_data.seed_keyword,
         ))
 
-        titles = []
-        for candidate in search_result.candidates:
-            titles.append(candidate['snippet']['title'])
+        # ヒットからのタイトル取り出しを C 実装の itemgetter で行い、正規化へそのままストリームで渡す
+        titles = map(_get_title, map(_get_snippet, search_result.candidates))
 
         # 2. 前処理 (正規化とフィルタリング)
         normalized_titles = self.formatter.normalize_titles_list(titles)
@@ -64,23 +68,23 @@ class SubmitTaskUseCase(UseCaseBase):
         # 4. GraphDBへの登録 (CreateGraphのロジックを再利用)
         # AnalyzeKeywordsOutputItemをCreateGraphInputItemに変換し、登録
 
-        # 登録に必要なデータ形式に変換
-        registration_data = [
-            {
-                'keyword': item.keyword,
-                'score': item.score,
-                'iab_categories': item.iab_categories,
-                'entity_type': item.entity_type
-            }
-            for item in analyze_output.results
-        ]
+        # 登録に必要なデータ形式 (項目毎の並列リスト) に 1 パスで変換
+        keywords, scores, iab_categories, entity_types = [], [], [], []
+        for item in analyze_output.results:
+            keywords.append(item.keyword)
+            scores.append(item.score)
+            iab_categories.append(item.iab_categories)
+            entity_types.append(item.entity_type)
 
         # チャンネル名検出ロジックは省略（必要に応じてtitlesから抽出）
         channel_name = None
 
-        success = await self.graph_repo.register_related_keywords(
+        success = await self.graph_repo.register_related_keywords_columnar(
             seed_keyword=in_data.seed_keyword,
-            extracted_data=registration_data,
+            keywords=keywords,
+            scores=scores,
+            iab_categories=iab_categories,
+            entity_types=entity_types,
             channel_name=channel_name
         )
 
@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+_MISSING = object()
+
+
+class LruCache(Generic[K, V]):
+    """
+    件数上限付きの単純な LRU キャッシュ。
+    インスタンスメソッドに functools.lru_cache を使うと self を保持し続けてしまうため、
+    リポジトリのクラス属性として共有する用途を想定しています。
+    (単一のイベントループ上で利用する前提のため、ロックは取りません)
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[K, V] = OrderedDict()
+
+    def get(self, key: K, default: Any = None) -> V | Any:
+        """キーに対応する値を返し、最近利用したものとして末尾に移動します。"""
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        """値を登録し、上限を超えた場合は最も古いエントリを破棄します。"""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: K) -> None:
+        """キーを削除します (存在しない場合は何もしません)。"""
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TtlLruCache(Generic[K, V]):
+    """
+    有効期限 (TTL) 付きの LRU キャッシュ。期限切れのエントリは参照時に破棄します。
+    読み取り専用クエリの結果を短時間だけ共有する用途を想定しています。
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._cache: LruCache[K, tuple[float, V]] = LruCache(maxsize=maxsize)
+
+    def get(self, key: K, default: Any = None) -> V | Any:
+        entry = self._cache.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._cache.invalidate(key)
+            return default
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        self._cache.set(key, (time.monotonic() + self.ttl, value))
+
+    def invalidate(self, key: K) -> None:
+        self._cache.invalidate(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    1 分あたりのリクエスト数 (RPM) を上限とするトークンバケット。
+    トークンは経過時間に応じて連続的に補充され、バケットが空の場合は補充されるまで待機します。
+    (単一のイベントループ上で利用する前提のため、ロックは取りません)
+    """
+
+    def __init__(self, requests_per_minute: int):
+        self.rate_per_second = requests_per_minute / 60
+        # 最大で 1 秒分のバーストを許容する (最低 1 リクエスト)
+        self.capacity = max(1.0, self.rate_per_second)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """トークンを 1 つ消費します。空の場合は次のトークンが補充されるまで待機します。"""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
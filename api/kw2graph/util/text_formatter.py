@@ -1,5 +1,8 @@
+import asyncio
+import multiprocessing
 import re
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterable, Iterator
 
 
 class TextFormatter:
@@ -33,6 +36,23 @@ class TextFormatter:
     # 4. 連続する空白文字を一つにまとめる
     WHITESPACE_PATTERN = re.compile(r"\s+")
 
+    # 2〜3 を 1 つの選択パターンにまとめたもの。normalize_title では括弧の除去後、1 回の走査で除去する
+    # (ハッシュタグは空白に、絵文字は空文字に置換する。どの種別にマッチしたかは名前付きグループで判別する)
+    # 注意: 括弧はここに含めない。"#a【b c】" のようにハッシュタグ直後の括弧をハッシュタグ側が先に食ってしまい、
+    # 括弧 → ハッシュタグ → 絵文字の順に除去していた従来の結果と変わってしまうため
+    NOISE_PATTERN = re.compile(
+        f"(?P<hashtag>{HASHTAG_PATTERN.pattern})"
+        f"|(?P<emoji>{EMOJI_PATTERN.pattern})",
+        flags=re.UNICODE
+    )
+    NOISE_REPLACEMENTS = {'hashtag': " ", 'emoji': ""}
+
+    # これを超える件数のタイトルは、プロセスプールで分割して並列に正規化する (正規表現処理でイベントループを止めないため)
+    # (これ以下ではプロセス間通信のコストの方が大きいため、呼び出し元のスレッドで処理する)
+    # ES の検索結果は最大 100 件のため、実際に到達するのは /analyze にクライアントが大量の children を渡した場合のみ
+    PROCESS_POOL_THRESHOLD = 2000
+    PROCESS_POOL_CHUNK_SIZE = 1000
+
     def __init__(self):
         """インスタンス化時に特に必要な処理はありません。"""
         pass
@@ -61,34 +81,88 @@ class TextFormatter:
         """
         # 処理順序は重要です: 除去してから空白を正規化するのがベスト
 
-        # 1. 括弧内のコンテンツを除去
-        text = self.remove_bracketed_content(title)
-
-        # 2. ハッシュタグを除去
-        text = self.remove_hashtags(text)
+        # 1. 括弧内のコンテンツを除去 (ハッシュタグより先に、文字列全体に対して適用する)
+        text = _sub_bracket(" ", title)
 
-        # 3. 絵文字や記号を除去
-        text = self.remove_emojis_and_symbols(text)
+        # 2〜3. ハッシュタグ・絵文字や記号を 1 回の走査で除去
+        text = _sub_noise(_replace_noise, text)
 
         # 4. 最後に、連続する空白を整理 (この段階で空文字列になる)
-        text = self.normalize_whitespace(text)
+        return _sub_whitespace(" ", text).strip()
 
-        return text
+    def iter_normalized_titles(self, titles: Iterable[str]) -> Iterator[str]:
+        """
+        タイトルを1件ずつ正規化し、空文字列を除外しながら順に返すジェネレータ。
+        中間リストを作らないため、ES のヒットなどをそのままストリームで渡せます。
+        """
+        for title in titles:
+            normalized_title = self.normalize_title(title)
+            # 空文字列 ("") は False と評価されるため、ここで除外する
+            if normalized_title:
+                yield normalized_title
 
-    def normalize_titles_list(self, titles: List[str]) -> List[str]:
+    def normalize_titles_list(self, titles: Iterable[str]) -> List[str]:
         """
         タイトルのリスト全体に対して正規化処理を実行し、空文字列を除外します。
 
-        :param titles: 処理対象のタイトル文字列のリスト
+        :param titles: 処理対象のタイトル文字列の Iterable (ジェネレータも可)
         :return: 正規化され、空でない文字列のみを含むリスト
         """
-        # ★ 修正ポイント: リスト内包表記に if normalized_title: の条件を追加
-        normalized_list = [self.normalize_title(title) for title in titles]
-
-        # Pythonでは、空文字列 ("") はブール値として False と評価されます。
-        # したがって、if normalized_title で空文字列を効率的に除外できます。
-        return [
-            normalized_title
-            for normalized_title in normalized_list
-            if normalized_title
-        ]
+        # ジェネレータを経由せず、内包表記 1 パスで正規化と空文字列の除外を行う
+        normalize_title = self.normalize_title
+        return [normalized for title in titles if (normalized := normalize_title(title))]
+
+    async def anormalize_titles_list(self, titles: Iterable[str]) -> List[str]:
+        """
+        normalize_titles_list の非同期版。件数が PROCESS_POOL_THRESHOLD を超える場合は、
+        PROCESS_POOL_CHUNK_SIZE 件ずつプロセスプールで並列に正規化します (結果の順序は保持されます)。
+        """
+        titles = titles if isinstance(titles, list) else list(titles)
+        if len(titles) <= self.PROCESS_POOL_THRESHOLD:
+            return self.normalize_titles_list(titles)
+
+        loop = asyncio.get_running_loop()
+        pool = _get_process_pool()
+        chunk_size = self.PROCESS_POOL_CHUNK_SIZE
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pool, _normalize_titles_chunk, titles[i:i + chunk_size])
+            for i in range(0, len(titles), chunk_size)
+        ))
+        return [title for chunk in chunks for title in chunk]
+
+
+# normalize_title はタイトル毎に呼ばれるため、属性参照を省けるようモジュールレベルに束縛しておく
+_sub_bracket = TextFormatter.BRACKET_CONTENT_PATTERN.sub
+_sub_noise = TextFormatter.NOISE_PATTERN.sub
+_sub_whitespace = TextFormatter.WHITESPACE_PATTERN.sub
+_NOISE_REPLACEMENTS = TextFormatter.NOISE_REPLACEMENTS
+
+
+def _replace_noise(match: re.Match) -> str:
+    return _NOISE_REPLACEMENTS[match.lastgroup]
+
+
+# 大量タイトルの正規化に使うプロセスプール (初回利用時に生成し、アプリケーション終了時に lifespan で破棄する)
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # Linux 既定の fork は、Gremlin ドライバや既定 Executor のスレッドを持つ uvicorn プロセスを複製するため、
+        # 他スレッドが保持していたロックを子プロセスが引き継いでデッドロックし得る。forkserver から起動させる
+        _process_pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context('forkserver'))
+    return _process_pool
+
+
+def shutdown_process_pool() -> None:
+    """正規化用のプロセスプールを破棄します (未使用の場合は何もしません)。"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+
+def _normalize_titles_chunk(titles: List[str]) -> List[str]:
+    """プロセスプールのワーカーで実行する正規化処理 (pickle 可能なモジュールレベル関数である必要がある)。"""
+    return TextFormatter().normalize_titles_list(titles)
@@ -0,0 +1,45 @@
+import pytest
+
+from kw2graph import config
+from kw2graph.infrastructure.elasticsearch_manager import GLOBAL_ELASTICSEARCH_MANAGER
+from kw2graph.infrastructure.graphdb import GraphDatabaseRepository
+from kw2graph.infrastructure.openai import OpenAiRepository
+from kw2graph.infrastructure.openai_manager import GLOBAL_OPENAI_MANAGER
+
+
+@pytest.fixture(autouse=True)
+def uninitialized_clients(monkeypatch):
+    """外部クライアントを初期化せずにリポジトリを生成できるようにする (API 呼び出しは各テストで差し替える)。"""
+    monkeypatch.setattr(GLOBAL_OPENAI_MANAGER, 'get_client', lambda: None)
+    monkeypatch.setattr(GLOBAL_OPENAI_MANAGER, 'get_async_client', lambda: None)
+    monkeypatch.setattr(GLOBAL_ELASTICSEARCH_MANAGER, 'get_client', lambda: None)
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_caches():
+    """リポジトリのキャッシュはクラス属性としてプロセス全体で共有されるため、テスト毎に空にする"""
+    def clear():
+        OpenAiRepository._result_cache.clear()
+        OpenAiRepository._result_inflight.clear()
+        GraphDatabaseRepository._node_id_cache.clear()
+        GraphDatabaseRepository._graph_cache.clear()
+        GraphDatabaseRepository._graph_inflight.clear()
+
+    clear()
+    yield
+    clear()
+
+
+@pytest.fixture
+def settings() -> config.Settings:
+    return config.Settings()
+
+
+@pytest.fixture
+def openai_repo(settings) -> OpenAiRepository:
+    return OpenAiRepository(settings)
+
+
+@pytest.fixture
+def graph_repo(settings) -> GraphDatabaseRepository:
+    return GraphDatabaseRepository(settings, client_instance=None)
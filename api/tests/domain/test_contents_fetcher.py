@@ -0,0 +1,53 @@
+import asyncio
+
+from kw2graph.domain.contents_fetcher import ContentsFetcherService
+
+
+def _hits(*titles: str) -> dict:
+    return {'hits': {'hits': [{'_source': {'snippet': {'title': title}}} for title in titles]}}
+
+
+def _fetcher(settings, response: dict) -> tuple[ContentsFetcherService, list]:
+    requests = []
+
+    async def fake_msearch(index, field, keywords, source_fields=None):
+        requests.append(keywords)
+        return response
+
+    fetcher = ContentsFetcherService(settings)
+    fetcher.es_repo.msearch = fake_msearch
+    return fetcher, requests
+
+
+def test_fetch_many_keeps_keyword_order_and_isolates_item_errors(settings):
+    response = {'responses': [
+        _hits('うさぎの動画'),
+        {'error': {'type': 'search_phase_execution_exception'}},
+        # filter_path によりヒットなしの要素は空の dict になる
+        {},
+    ]}
+    fetcher, requests = _fetcher(settings, response)
+
+    outputs = asyncio.run(fetcher.fetch_many('youtube', 'snippet.title', ['うさぎ', 'ハチワレ', 'モモンガ']))
+
+    assert requests == [['うさぎ', 'ハチワレ', 'モモンガ']]
+    assert [output.seed_keyword for output in outputs] == ['うさぎ', 'ハチワレ', 'モモンガ']
+    assert outputs[0].candidates == [{'snippet': {'title': 'うさぎの動画'}}]
+    assert outputs[1].candidates == []
+    assert outputs[2].candidates == []
+
+
+def test_fetch_many_pads_missing_responses(settings):
+    # 全件ヒットなしの場合、filter_path により responses キー自体が省略される
+    fetcher, _ = _fetcher(settings, {})
+
+    outputs = asyncio.run(fetcher.fetch_many('youtube', 'snippet.title', ['うさぎ', 'ハチワレ']))
+
+    assert [(output.seed_keyword, output.candidates) for output in outputs] == [('うさぎ', []), ('ハチワレ', [])]
+
+
+def test_fetch_many_skips_request_for_no_keywords(settings):
+    fetcher, requests = _fetcher(settings, {})
+
+    assert asyncio.run(fetcher.fetch_many('youtube', 'snippet.title', [])) == []
+    assert requests == []
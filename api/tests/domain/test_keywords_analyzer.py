@@ -0,0 +1,41 @@
+import asyncio
+
+from openai import APIConnectionError
+
+from kw2graph.domain.keywords_analyzer import KeywordsAnalyzerService
+from kw2graph.usecase.input.analyze_keywords import AnalyzeKeywordsInput
+from kw2graph.usecase.output.analyze_keywords import AnalyzeKeywordsOutput, AnalyzeKeywordsStreamError
+
+
+def _keyword(keyword: str, score: float) -> dict:
+    return {'keyword': keyword, 'score': score, 'iab_categories': [], 'entity_type': 'Other'}
+
+
+def test_analyze_stream_yields_error_line_for_failed_batch(settings, openai_repo, monkeypatch):
+    async def fake_extract(seed_keyword, titles):
+        if titles == ['失敗するタイトル']:
+            raise APIConnectionError(request=None)
+        return [_keyword(f'{title}-{i}', float(i)) for title in titles for i in range(10)]
+
+    # タイトル 1 件ずつをバッチとし、2 件目のバッチだけ OpenAI 呼び出しを失敗させる
+    monkeypatch.setattr(openai_repo, '_split_batches', lambda titles: [[title] for title in titles])
+    monkeypatch.setattr(openai_repo, '_aextract_related_keywords', fake_extract)
+    service = KeywordsAnalyzerService(settings)
+    service.openai_repo = openai_repo
+
+    async def collect():
+        return [output async for output in service.analyze_stream(
+            AnalyzeKeywordsInput(seed_keyword='ちいかわ', children=['成功するタイトル', '失敗するタイトル']))]
+
+    outputs = asyncio.run(collect())
+
+    assert len(outputs) == 2
+    results = [output for output in outputs if isinstance(output, AnalyzeKeywordsOutput)]
+    errors = [output for output in outputs if isinstance(output, AnalyzeKeywordsStreamError)]
+    # 成功したバッチは、そのバッチ内の上位 N 件だけを返す
+    assert [item.keyword for item in results[0].results] == [
+        f'成功するタイトル-{i}' for i in range(9, 9 - KeywordsAnalyzerService.TOP_N_LIMIT, -1)]
+    assert len(errors) == 1
+    assert errors[0].keyword == 'ちいかわ'
+    assert 'APIConnectionError' in errors[0].error
+    assert set(errors[0].model_dump()) == {'keyword', 'error'}
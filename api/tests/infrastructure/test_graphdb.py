@@ -0,0 +1,153 @@
+import asyncio
+
+from kw2graph import config
+from kw2graph.infrastructure.graphdb import GraphDatabaseRepository
+
+
+def _graph(seed_keyword: str) -> dict:
+    return {'nodes': [{'id': seed_keyword}], 'edges': []}
+
+
+def test_fetch_related_graph_coalesces_concurrent_misses(graph_repo, monkeypatch):
+    calls = []
+
+    async def fake_fetch(seed_keyword, *args):
+        calls.append(seed_keyword)
+        await asyncio.sleep(0.01)
+        return _graph(seed_keyword)
+
+    monkeypatch.setattr(graph_repo, '_fetch_related_graph_uncached', fake_fetch)
+
+    async def run():
+        results = await asyncio.gather(*(graph_repo.fetch_related_graph('ちいかわ') for _ in range(5)))
+        # 完了後の呼び出しはキャッシュから返す
+        results.append(await graph_repo.fetch_related_graph('ちいかわ'))
+        return results
+
+    results = asyncio.run(run())
+
+    assert calls == ['ちいかわ']
+    assert all(result is results[0] for result in results)
+    assert not GraphDatabaseRepository._graph_inflight
+
+
+def test_fetch_related_graph_waiter_retries_when_owner_is_cancelled(graph_repo, monkeypatch):
+    calls = []
+
+    async def fake_fetch(seed_keyword, *args):
+        calls.append(seed_keyword)
+        # 1 回目 (キャンセルされる呼び出し) だけ応答を返さずに待ち続ける
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return _graph(seed_keyword)
+
+    monkeypatch.setattr(graph_repo, '_fetch_related_graph_uncached', fake_fetch)
+
+    async def run():
+        owner = asyncio.create_task(graph_repo.fetch_related_graph('ちいかわ'))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(graph_repo.fetch_related_graph('ちいかわ'))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await waiter, owner
+
+    result, owner = asyncio.run(run())
+
+    # 待機側は CancelledError で失敗せず、自身で取得し直す
+    assert owner.cancelled()
+    assert result == _graph('ちいかわ')
+    assert calls == ['ちいかわ', 'ちいかわ']
+
+
+def test_fetch_related_graph_does_not_cache_failures(graph_repo, monkeypatch):
+    calls = []
+
+    async def fake_fetch(seed_keyword, *args):
+        calls.append(seed_keyword)
+        raise ConnectionError("Gremlin Client is not initialized.")
+
+    monkeypatch.setattr(graph_repo, '_fetch_related_graph_uncached', fake_fetch)
+
+    async def run():
+        return [await graph_repo.fetch_related_graph('ちいかわ') for _ in range(2)]
+
+    results = asyncio.run(run())
+
+    assert results == [{'nodes': [], 'edges': []}] * 2
+    assert len(calls) == 2
+
+
+def _registration_results(bindings: dict) -> list:
+    """BULK_REGISTER_SCRIPT の戻り値 ([label, name, id] のリスト) を bindings から組み立てる"""
+    names = [(bindings['kwLabel'], bindings['seed'])]
+    if bindings['channel']:
+        names.append((bindings['chLabel'], bindings['channel']))
+    names += [(bindings['catLabel'], category) for category in bindings['categories']]
+    names += [(bindings['kwLabel'], keyword) for keyword in bindings['itemKeywords']]
+    return [[[label, name, f'{label}:{name}'] for label, name in names]]
+
+
+def test_register_related_keywords_dedups_and_chunks(monkeypatch):
+    graph_repo = GraphDatabaseRepository(config.Settings(graphdb_write_batch_size=2), client_instance=None)
+    submitted = []
+
+    async def fake_execute(query, bindings):
+        submitted.append(bindings)
+        return _registration_results(bindings)
+
+    monkeypatch.setattr(graph_repo, '_execute_with_retry', fake_execute)
+    extracted = [
+        {'keyword': 'うさぎ', 'score': 0.5, 'iab_categories': ['Hobbies & Interests']},
+        # 表記揺れ (大文字小文字・前後空白) はまとめ、スコアが最大のものを登録する
+        {'keyword': ' うさぎ ', 'score': 0.1},
+        {'keyword': 'Hachiware', 'score': 0.2},
+        {'keyword': 'hachiware', 'score': 0.9, 'iab_categories': ['Arts & Entertainment']},
+        {'keyword': 'モモンガ', 'score': 0.3},
+        {'keyword': 'くりまんじゅう', 'score': 0.4},
+    ]
+
+    assert asyncio.run(graph_repo.register_related_keywords('ちいかわ', extracted, 'ちいかわ公式')) is True
+
+    # 1 回目でシード/チャンネル/全カテゴリを登録し、残りを batch_size 件ずつのチャンクで送信する
+    head, *chunks = submitted
+    assert head['itemKeywords'] == []
+    assert head['channel'] == 'ちいかわ公式'
+    assert head['categories'] == ['Hobbies & Interests', 'Arts & Entertainment']
+    assert all(len(chunk['itemKeywords']) <= 2 for chunk in chunks)
+    keywords = [keyword for chunk in chunks for keyword in chunk['itemKeywords']]
+    scores = [score for chunk in chunks for score in chunk['itemScores']]
+    assert sorted(zip(keywords, scores)) == sorted([
+        ('うさぎ', 0.5), ('hachiware', 0.9), ('モモンガ', 0.3), ('くりまんじゅう', 0.4)])
+    # 2 回目以降はキャッシュ済みの頂点 ID を渡し、シードの name 検索をスクリプトに行わせない
+    for chunk in chunks:
+        assert chunk['known'][GraphDatabaseRepository.NODE_LABEL_KEYWORD]['ちいかわ'] == 'Keyword:ちいかわ'
+        assert 'ちいかわ' not in chunk['lookupNames'].get(GraphDatabaseRepository.NODE_LABEL_KEYWORD, [])
+
+
+def test_register_related_keywords_small_input_is_single_round_trip(monkeypatch):
+    graph_repo = GraphDatabaseRepository(config.Settings(graphdb_write_batch_size=25), client_instance=None)
+    submitted = []
+
+    async def fake_execute(query, bindings):
+        submitted.append(bindings)
+        return _registration_results(bindings)
+
+    monkeypatch.setattr(graph_repo, '_execute_with_retry', fake_execute)
+    extracted = [{'keyword': 'うさぎ', 'score': 0.5}, {'keyword': 'ハチワレ', 'score': 0.4}]
+
+    assert asyncio.run(graph_repo.register_related_keywords('ちいかわ', extracted)) is True
+    assert len(submitted) == 1
+    assert submitted[0]['itemKeywords'] == ['うさぎ', 'ハチワレ']
+
+
+def test_register_related_keywords_fails_when_a_chunk_fails(monkeypatch):
+    graph_repo = GraphDatabaseRepository(config.Settings(graphdb_write_batch_size=1), client_instance=None)
+
+    async def fake_execute(query, bindings):
+        if 'モモンガ' in bindings['itemKeywords']:
+            return []
+        return _registration_results(bindings)
+
+    monkeypatch.setattr(graph_repo, '_execute_with_retry', fake_execute)
+    extracted = [{'keyword': 'うさぎ', 'score': 0.5}, {'keyword': 'モモンガ', 'score': 0.4}]
+
+    assert asyncio.run(graph_repo.register_related_keywords('ちいかわ', extracted)) is False
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+import orjson
+
+from kw2graph import config
+from kw2graph.infrastructure.openai import OpenAiRepository
+
+
+def _keywords(*keywords: str) -> list:
+    return [{'keyword': keyword, 'score': 0.5} for keyword in keywords]
+
+
+def test_process_batch_async_coalesces_concurrent_batches(openai_repo, monkeypatch):
+    calls = []
+
+    async def fake_extract(seed_keyword, titles):
+        calls.append(titles)
+        await asyncio.sleep(0.01)
+        return _keywords('うさぎ')
+
+    monkeypatch.setattr(openai_repo, '_aextract_related_keywords', fake_extract)
+
+    async def run():
+        # タイトルの並び順が違うだけのバッチも、同じ抽出結果を共有する
+        return await asyncio.gather(
+            openai_repo._process_batch_async('ちいかわ', ['a', 'b']),
+            openai_repo._process_batch_async('ちいかわ', ['b', 'a']),
+            openai_repo._process_batch_async('ちいかわ', ['a', 'b']),
+        )
+
+    results = asyncio.run(run())
+
+    assert calls == [['a', 'b']]
+    assert results == [_keywords('うさぎ')] * 3
+    assert not OpenAiRepository._result_inflight
+
+
+def test_process_batch_async_waiter_retries_when_owner_is_cancelled(openai_repo, monkeypatch):
+    calls = []
+
+    async def fake_extract(seed_keyword, titles):
+        calls.append(titles)
+        # 1 回目 (キャンセルされる呼び出し) だけ応答を返さずに待ち続ける
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return _keywords('うさぎ')
+
+    monkeypatch.setattr(openai_repo, '_aextract_related_keywords', fake_extract)
+
+    async def run():
+        owner = asyncio.create_task(openai_repo._process_batch_async('ちいかわ', ['a']))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(openai_repo._process_batch_async('ちいかわ', ['a']))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await waiter, owner
+
+    result, owner = asyncio.run(run())
+
+    # 待機側は CancelledError で失敗せず、自身で抽出し直す
+    assert owner.cancelled()
+    assert result == _keywords('うさぎ')
+    assert len(calls) == 2
+
+
+def _batch_repo(batches, output_text: str = '', **settings) -> tuple[OpenAiRepository, list]:
+    """batches.retrieve が batches の状態を順に返す AsyncOpenAI スタブを持つリポジトリを生成する"""
+    cancelled = []
+    statuses = iter(batches)
+
+    async def retrieve(batch_id):
+        return next(statuses)
+
+    async def cancel(batch_id):
+        cancelled.append(batch_id)
+
+    async def content(file_id):
+        return SimpleNamespace(text=output_text)
+
+    repo = OpenAiRepository(config.Settings(**settings))
+    repo.aclient = SimpleNamespace(
+        batches=SimpleNamespace(retrieve=retrieve, cancel=cancel),
+        files=SimpleNamespace(content=content),
+    )
+    return repo, cancelled
+
+
+def test_wait_for_batch_cancels_after_timeout():
+    in_progress = SimpleNamespace(status='in_progress', output_file_id=None)
+    repo, cancelled = _batch_repo([in_progress] * 10,
+                                  openai_batch_poll_interval_seconds=0.01, openai_batch_timeout_seconds=0.02)
+    jobs = [('ちいかわ', ['a']), ('ちいかわ', ['b'])]
+
+    results = asyncio.run(repo.wait_for_batch('batch_1', jobs))
+
+    assert results == [[], []]
+    assert cancelled == ['batch_1']
+
+
+def test_wait_for_batch_skips_malformed_output_lines():
+    content = orjson.dumps({'related_keywords': _keywords('うさぎ')}).decode()
+    lines = [
+        # 正常な応答
+        {'custom_id': '0', 'response': {'status_code': 200, 'body': {'choices': [{'message': {'content': content}}]}}},
+        # choices が空の応答
+        {'custom_id': '1', 'response': {'status_code': 200, 'body': {'choices': []}}},
+        # custom_id のない行
+        {'response': {'status_code': 200}},
+    ]
+    output_text = "\n".join(orjson.dumps(line).decode() for line in lines) + "\nnot json\n"
+    completed = SimpleNamespace(status='completed', output_file_id='file_1')
+    repo, cancelled = _batch_repo([completed], output_text)
+    jobs = [('ちいかわ', ['a']), ('ちいかわ', ['b'])]
+
+    results = asyncio.run(repo.wait_for_batch('batch_1', jobs))
+
+    assert results[1] == []
+    assert [item['keyword'] for item in results[0]] == ['うさぎ']
+    assert cancelled == []
@@ -0,0 +1,16 @@
+from fastapi.testclient import TestClient
+
+from kw2graph.main import app
+
+
+def test_invalid_request_body_returns_400_with_errors():
+    # lifespan (外部クライアントの初期化) を起動しないよう、with を使わずに TestClient を生成する
+    client = TestClient(app)
+
+    response = client.post('/analyze', json={'seed_keyword': 'ちいかわ'})
+
+    assert response.status_code == 400
+    errors = response.json()
+    assert isinstance(errors, list)
+    assert [error['loc'] for error in errors] == [['body', 'children']]
+    assert errors[0]['type'] == 'missing'
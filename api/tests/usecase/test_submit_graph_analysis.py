@@ -0,0 +1,27 @@
+import asyncio
+
+from kw2graph.usecase.input.submit_task import SubmitTaskInput
+from kw2graph.usecase.output.get_candidate import GetCandidateOutput
+from kw2graph.usecase.submit_graph_analysis import SubmitGraphAnalysisUseCase
+
+
+def test_fetch_candidates_many_chunks_msearch_and_maps_by_keyword(settings, graph_repo, monkeypatch):
+    monkeypatch.setattr(SubmitGraphAnalysisUseCase, 'MSEARCH_BATCH_SIZE', 2)
+    requests = []
+
+    async def fake_fetch_many(index, field, keywords, source_fields=None):
+        requests.append((keywords, source_fields))
+        return [GetCandidateOutput.model_construct(seed_keyword=keyword,
+                                                   candidates=[{'snippet': {'title': f'{keyword}の動画'}}])
+                for keyword in keywords]
+
+    use_case = SubmitGraphAnalysisUseCase(settings, graph_repo=graph_repo)
+    monkeypatch.setattr(use_case.fetcher, 'fetch_many', fake_fetch_many)
+    in_data = SubmitTaskInput(seed_keyword='ちいかわ', index='youtube', field='snippet.title')
+    keywords = ['うさぎ', 'ハチワレ', 'モモンガ', 'くりまんじゅう', 'ラッコ']
+
+    candidates = asyncio.run(use_case._fetch_candidates_many(in_data, keywords))
+
+    assert [chunk for chunk, _ in requests] == [['うさぎ', 'ハチワレ'], ['モモンガ', 'くりまんじゅう'], ['ラッコ']]
+    assert all(source_fields == [SubmitGraphAnalysisUseCase.TITLE_SOURCE_FIELD] for _, source_fields in requests)
+    assert candidates == {keyword: [{'snippet': {'title': f'{keyword}の動画'}}] for keyword in keywords}
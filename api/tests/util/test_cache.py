@@ -0,0 +1,49 @@
+from kw2graph.util import cache
+from kw2graph.util.cache import LruCache, TtlLruCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru: LruCache[str, int] = LruCache(maxsize=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    # 参照した 'a' は最近利用したものとして残り、'b' が破棄される
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+
+    assert 'b' not in lru
+    assert lru.get('a') == 1
+    assert lru.get('c') == 3
+    assert len(lru) == 2
+
+
+def test_lru_cache_distinguishes_missing_from_falsy_values():
+    lru: LruCache[str, list] = LruCache(maxsize=2)
+    lru.set('empty', [])
+
+    assert lru.get('empty', 'default') == []
+    assert lru.get('missing', 'default') == 'default'
+
+
+def test_ttl_lru_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    ttl_cache: TtlLruCache[str, int] = TtlLruCache(maxsize=2, ttl=30)
+    ttl_cache.set('a', 1)
+
+    now[0] += 30
+    assert ttl_cache.get('a') == 1
+
+    now[0] += 0.1
+    assert ttl_cache.get('a') is None
+    # 期限切れのエントリは参照時に破棄される
+    assert len(ttl_cache) == 0
+
+
+def test_ttl_lru_cache_respects_maxsize(monkeypatch):
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: 0.0)
+    ttl_cache: TtlLruCache[str, int] = TtlLruCache(maxsize=1, ttl=30)
+    ttl_cache.set('a', 1)
+    ttl_cache.set('b', 2)
+
+    assert ttl_cache.get('a') is None
+    assert ttl_cache.get('b') == 2
@@ -0,0 +1,27 @@
+import pytest
+
+from kw2graph.util.text_formatter import TextFormatter
+
+
+def _normalize_title_sequential(formatter: TextFormatter, title: str) -> str:
+    """括弧 → ハッシュタグ → 絵文字 → 空白の順に 1 パスずつ除去していた従来の normalize_title。"""
+    text = formatter.remove_bracketed_content(title)
+    text = formatter.remove_hashtags(text)
+    text = formatter.remove_emojis_and_symbols(text)
+    return formatter.normalize_whitespace(text)
+
+
+@pytest.mark.parametrize("title", [
+    "#ちいかわ【うさぎ 登場】 まとめ",
+    "#a【b c】",
+    "#a【b c",
+    "#【b】c",
+    "【x #y】z",
+    "新型ランクル70 (カスタム紹介) #車 #ランクル 🚙",
+    "😀#a😀 b",
+    "[公式] 料理動画（前編） #飯テロ✨",
+    "",
+])
+def test_normalize_title_matches_sequential_passes(title):
+    formatter = TextFormatter()
+    assert formatter.normalize_title(title) == _normalize_title_sequential(formatter, title)